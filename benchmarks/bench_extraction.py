@@ -0,0 +1,45 @@
+"""Compare the latency of the structured (single script) and text extraction paths.
+
+Usage:
+    python -m benchmarks.bench_extraction [--url URL] [--runs 20]
+"""
+import time
+import asyncio
+import argparse
+import statistics
+from typing import List
+from src.models import MusicSearchQuery
+from src.tools import MusicByMoodScraper
+
+
+def _summary(samples: List[float]) -> str:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered):8.1f} ms | p95 {p95:8.1f} ms | min {ordered[0]:8.1f} ms"
+
+
+async def main(url: str, runs: int, limit: int) -> None:
+    MusicByMoodScraper.BASE_URL = url
+    query = MusicSearchQuery(mood="Happy", energy_level=60, happiness_level=70, genres=["Pop"])
+    async with MusicByMoodScraper() as scraper:
+        await scraper.goto()
+        await scraper.apply_query(query)
+
+        for mode in ("script", "text"):
+            samples = []
+            count = 0
+            for _ in range(runs):
+                start = time.perf_counter()
+                songs = await scraper.extract_results(limit=limit, mode=mode)
+                samples.append((time.perf_counter() - start) * 1000)
+                count = len(songs)
+            print(f"{mode:>6}: {count:2d} songs | {_summary(samples)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=MusicByMoodScraper.BASE_URL)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.runs, args.limit))
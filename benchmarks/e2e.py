@@ -0,0 +1,163 @@
+"""Offline end-to-end latency benchmark of the chat stack.
+
+Runs chat_app under uvicorn with the scripted model client (benchmarks/fake_llm.py)
+in place of OpenAI for the chat agent and the music team, and points the scraper at
+the local stand-in site (benchmarks/fixture_site.py). N WebSocket clients chat
+concurrently; the per-stage latencies recorded through src/timing.py and the
+client-side turn times are reported as JSON (count, mean, p50, p95, p99, max in
+ms), so the output of two runs can be diffed.
+
+Usage:
+    python -m benchmarks.e2e [--clients 4] [--turns 4] [--llm-latency-ms 400]
+                             [--site-delay-ms 800] [--pool-size 2] [--output e2e.json]
+"""
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+# Alternating music requests and plain chat turns, offset per client
+MESSAGES = [
+    "I feel sad and lonely tonight, could you play some music for me?",
+    "Thank you, that means a lot.",
+    "I need some music to focus on work this afternoon.",
+    "That helps, I think I can concentrate now.",
+    "We're having a party later, play some songs to get us going!",
+    "Haha, everyone will love that.",
+    "I'm stressed about exams, any calm music?",
+    "Thanks for listening to me.",
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _configure(args: argparse.Namespace, workdir: Path) -> None:
+    """Settings of the app under test; must run before chat_app and src are imported."""
+    model_config = workdir / "model_config.yaml"
+    model_config.write_text(
+        "provider: benchmarks.fake_llm.ScriptedChatCompletionClient\n"
+        f"config:\n  latency_ms: {args.llm_latency_ms}\n  chunk_delay_ms: {args.chunk_delay_ms}\n"
+    )
+    os.environ.update({
+        "CHATTUNE_TIMING": "1",
+        "MODEL_CONFIG_PATH": str(model_config),
+        "MUSIC_TEAM_MODEL_CONFIG": str(model_config),
+        "CHAT_STATE_DB": str(workdir / "chat_state.sqlite3"),
+        "SCRAPER_POOL_SIZE": str(args.pool_size),
+        "SCRAPER_STATIC_CACHE_DIR": str(workdir / "static_cache"),
+        "MUSIC_CATALOG_PATH": "",
+        # Every search reaches the browser unless the caches are asked for
+        "MUSIC_CACHE_TTL": "86400" if args.music_cache else "0",
+        "MUSIC_CACHE_PATH": str(workdir / "music_cache.sqlite3"),
+        "MUSIC_LLM_CACHE_AGENTS": "mood_detector,music_retriever,approver" if args.llm_cache else "",
+        "MUSIC_LLM_CACHE_PATH": str(workdir / "llm_cache.sqlite3"),
+        "MUSIC_PIPELINE_MODE": args.pipeline,
+        "AGENTOPS_API_KEY": "",
+    })
+
+
+async def _client(url: str, index: int, turns: int, timer: Any) -> Dict[str, int]:
+    """Chat for `turns` turns on its own session; returns failed turns and songs received."""
+    import websockets
+
+    errors = songs = 0
+    async with websockets.connect(f"{url}?session=bench-{index}", max_size=None) as ws:
+        for turn in range(turns):
+            message = MESSAGES[(index * 2 + turn) % len(MESSAGES)]
+            start = time.perf_counter()
+            first_frame = first_chunk = None
+            await ws.send(json.dumps({"content": message, "source": "user"}))
+            while True:
+                frame = json.loads(await ws.recv())
+                now = (time.perf_counter() - start) * 1000
+                if first_frame is None:
+                    first_frame = now
+                if frame.get("type") == "chunk" and first_chunk is None:
+                    first_chunk = now
+                if frame.get("type") == "progress" and frame.get("stage") == "song":
+                    songs += 1
+                if frame.get("type") in ("final", "cancelled"):
+                    break
+            timer.record("client_turn", now)
+            timer.record("client_first_frame", first_frame)
+            if first_chunk is not None:
+                timer.record("client_first_token", first_chunk)
+            if frame.get("type") != "final" or "MUSIC_SEARCH_ERROR" in frame.get("content", ""):
+                errors += 1
+    return {"failed_turns": errors, "songs": songs}
+
+
+async def main(args: argparse.Namespace) -> Dict[str, Any]:
+    import uvicorn
+    from benchmarks.fixture_site import FixtureSite
+
+    with tempfile.TemporaryDirectory() as tmp:
+        _configure(args, Path(tmp))
+        site = FixtureSite(delay_ms=args.site_delay_ms).start()
+        # Imported late so the modules read the settings above
+        import chat_app
+        from src.tools import MusicByMoodScraper
+        from src.timing import get_timer
+        MusicByMoodScraper.BASE_URL = site.url
+
+        port = _free_port()
+        server = uvicorn.Server(uvicorn.Config(chat_app.app, host="127.0.0.1", port=port, log_level="warning"))
+        serving = asyncio.create_task(server.serve())
+        try:
+            while not server.started:
+                if serving.done():
+                    serving.result()
+                await asyncio.sleep(0.05)
+
+            timer = get_timer()
+            start = time.perf_counter()
+            results = await asyncio.gather(*(
+                _client(f"ws://127.0.0.1:{port}/ws/chat", i, args.turns, timer) for i in range(args.clients)
+            ))
+            wall_ms = (time.perf_counter() - start) * 1000
+        finally:
+            server.should_exit = True
+            await serving
+            site.stop()
+
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "wall_ms": wall_ms,
+        "turns": args.clients * args.turns,
+        "failed_turns": sum(r["failed_turns"] for r in results),
+        # Songs streamed as progress events; 0 means no search reached the site
+        "songs_received": sum(r["songs"] for r in results),
+        "stages": timer.summary(),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent WebSocket clients")
+    parser.add_argument("--turns", type=int, default=4, help="Turns per client")
+    parser.add_argument("--llm-latency-ms", type=float, default=400, help="Latency of every model call")
+    parser.add_argument("--chunk-delay-ms", type=float, default=5, help="Delay between streamed words")
+    parser.add_argument("--site-delay-ms", type=float, default=800, help="Latency of the site's recommendations")
+    parser.add_argument("--pool-size", type=int, default=2, help="SCRAPER_POOL_SIZE (0 launches a browser per search)")
+    parser.add_argument("--pipeline", choices=["fast", "team"], default="fast", help="MUSIC_PIPELINE_MODE")
+    parser.add_argument("--music-cache", action="store_true", help="Keep the music result cache enabled")
+    parser.add_argument("--llm-cache", action="store_true", help="Keep the LLM response cache enabled")
+    parser.add_argument("--output", type=Path, help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        args.output.write_text(text + "\n")
+    else:
+        sys.stdout.write(text + "\n")
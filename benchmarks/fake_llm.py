@@ -0,0 +1,178 @@
+"""Scripted stand-in for the OpenAI client, used by the offline benchmarks.
+
+Load it like any other model client, e.g. in a model_config.yaml:
+
+    provider: benchmarks.fake_llm.ScriptedChatCompletionClient
+    config:
+      latency_ms: 400
+
+It recognizes the chat agent and the three music team agents by their system
+message and answers each with the message (or tool call) the real model would
+send, after `latency_ms`. Streaming yields the reply word by word.
+"""
+import re
+import json
+import asyncio
+from typing import Any, AsyncGenerator, Dict, List, Literal, Mapping, Optional, Sequence, Union
+from pydantic import BaseModel
+from typing_extensions import Self
+from autogen_core import CancellationToken, Component, FunctionCall
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+    SystemMessage,
+)
+from autogen_core.tools import Tool, ToolSchema
+
+# Keyword -> (mood, energy, happiness, genres) used to answer the mood detector
+_MOODS = {
+    "sad": ("Sad", 25, 20, ["Acoustic"]),
+    "lonely": ("Sad", 20, 25, ["Acoustic"]),
+    "stress": ("Relaxed", 30, 50, ["Classical"]),
+    "calm": ("Relaxed", 25, 60, ["Jazz"]),
+    "focus": ("Focused", 45, 55, ["Electronic"]),
+    "work": ("Focused", 50, 50, ["Classical"]),
+    "party": ("Energetic", 90, 85, ["Dance"]),
+    "gym": ("Energetic", 95, 70, ["Hip Hop"]),
+    "happy": ("Happy", 70, 90, ["Pop"]),
+}
+_DEFAULT_MOOD = ("Happy", 60, 70, ["Pop"])
+_MUSIC_WORDS = ("music", "song", "songs", "playlist", "listen", "play")
+# Compact tool result lines: "1. Title - Artist (genres; duration)"
+_SONG_LINE = re.compile(r"^\d+\. (.+?)(?: - (.+?))?(?: \([^()]*\))?$", re.MULTILINE)
+
+
+class ScriptedChatCompletionClientConfig(BaseModel):
+    latency_ms: float = 400
+    chunk_delay_ms: float = 5
+
+
+class ScriptedChatCompletionClient(ChatCompletionClient, Component[ScriptedChatCompletionClientConfig]):
+    """Deterministic fake of the chatTune model calls with a fixed latency."""
+
+    component_type = "model"
+    component_config_schema = ScriptedChatCompletionClientConfig
+    component_provider_override = "benchmarks.fake_llm.ScriptedChatCompletionClient"
+
+    def __init__(self, latency_ms: float = 400, chunk_delay_ms: float = 5) -> None:
+        self.latency_ms = latency_ms
+        self.chunk_delay_ms = chunk_delay_ms
+        self._total_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+        self._last_usage = RequestUsage(prompt_tokens=0, completion_tokens=0)
+
+    def _reply(self, messages: Sequence[LLMMessage], tools: Sequence[Tool | ToolSchema]) -> Union[str, List[FunctionCall]]:
+        system = " ".join(m.content for m in messages if isinstance(m, SystemMessage)).lower()
+        last = messages[-1]
+        text = last.content if isinstance(last.content, str) else ""
+        tool_names = [t.schema["name"] if isinstance(t, Tool) else t["name"] for t in tools]
+
+        if "mood detector" in system:
+            mood, energy, happiness, genres = next(
+                (v for k, v in _MOODS.items() if k in text.lower()), _DEFAULT_MOOD
+            )
+            return json.dumps({"mood": mood, "energy_level": energy, "happiness_level": happiness, "genres": genres})
+        if "music retriever" in system:
+            if isinstance(last, FunctionExecutionResultMessage):
+                return "Songs retrieved."
+            try:
+                arguments = json.loads(text)
+            except ValueError:
+                arguments = {"mood": _DEFAULT_MOOD[0]}
+            return [FunctionCall(id="call_search", name="search_music_by_mood", arguments=json.dumps(arguments))]
+        if "approver" in system:
+            songs = _SONG_LINE.findall(text)
+            lines = [f"{i}. {title} - {artist or 'Unknown'}" for i, (title, artist) in enumerate(songs, 1)]
+            return "🎵 Here are some great songs for you:\n\n" + "\n".join(lines) + "\n\nAPPROVED"
+
+        # Chat agent
+        if isinstance(last, FunctionExecutionResultMessage):
+            return "Here are a few songs that might fit how you feel right now. Which one speaks to you?"
+        if "search_music_for_user" in tool_names and any(w in text.lower() for w in _MUSIC_WORDS):
+            return [FunctionCall(id="call_music", name="search_music_for_user",
+                                 arguments=json.dumps({"description": text}))]
+        return "I hear you. Tell me a little more about how your day has been going?"
+
+    def _result(self, messages: Sequence[LLMMessage], content: Union[str, List[FunctionCall]]) -> CreateResult:
+        prompt_tokens = self.count_tokens(messages)
+        completion_tokens = len(content.split()) if isinstance(content, str) else 20
+        self._last_usage = RequestUsage(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens)
+        self._total_usage = RequestUsage(
+            prompt_tokens=self._total_usage.prompt_tokens + prompt_tokens,
+            completion_tokens=self._total_usage.completion_tokens + completion_tokens,
+        )
+        return CreateResult(finish_reason="function_calls" if isinstance(content, list) else "stop",
+                            content=content, usage=self._last_usage, cached=False)
+
+    async def _wait(self, seconds: float, cancellation_token: Optional[CancellationToken]) -> None:
+        sleep = asyncio.ensure_future(asyncio.sleep(seconds))
+        if cancellation_token is not None:
+            cancellation_token.link_future(sleep)
+        await sleep
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        await self._wait(self.latency_ms / 1000, cancellation_token)
+        return self._result(messages, self._reply(messages, tools))
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+        include_usage: Optional[bool] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        await self._wait(self.latency_ms / 1000, cancellation_token)
+        content = self._reply(messages, tools)
+        if isinstance(content, str):
+            for word in re.findall(r"\S+\s*", content):
+                yield word
+                await self._wait(self.chunk_delay_ms / 1000, cancellation_token)
+        yield self._result(messages, content)
+
+    async def close(self) -> None:
+        pass
+
+    def actual_usage(self) -> RequestUsage:
+        return self._last_usage
+
+    def total_usage(self) -> RequestUsage:
+        return self._total_usage
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return sum(len(str(m.content).split()) + 4 for m in messages)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return 128000 - self.count_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return ModelCapabilities(vision=False, function_calling=True, json_output=True)  # type: ignore
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return ModelInfo(vision=False, function_calling=True, json_output=True, family="unknown",
+                         structured_output=True)
+
+    def _to_config(self) -> ScriptedChatCompletionClientConfig:
+        return ScriptedChatCompletionClientConfig(latency_ms=self.latency_ms, chunk_delay_ms=self.chunk_delay_ms)
+
+    @classmethod
+    def _from_config(cls, config: ScriptedChatCompletionClientConfig) -> Self:
+        return cls(latency_ms=config.latency_ms, chunk_delay_ms=config.chunk_delay_ms)
@@ -0,0 +1,98 @@
+"""Local HTTP stand-in for musicbymood.com.
+
+Serves benchmarks/fixtures/musicbymood.html and a JSON recommendation endpoint
+whose response is delayed by `delay_ms`, like the real site's backend.
+
+Usage:
+    python -m benchmarks.fixture_site [--port 8765] [--delay-ms 800]
+"""
+import json
+import time
+import random
+import argparse
+import threading
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+PAGE = Path(__file__).parent / "fixtures" / "musicbymood.html"
+_WORDS = ["Blue", "Night", "Summer", "Light", "River", "Golden", "Echo", "Heart", "City", "Dream",
+          "Fire", "Ocean", "Silver", "Wild", "Morning", "Shadow", "Velvet", "Paper", "Neon", "Home"]
+_NAMES = ["Ada", "Milo", "Nova", "Jules", "Iris", "Theo", "Luna", "Otis", "Wren", "Cleo"]
+
+
+def recommendations(params: Dict[str, str], count: int = 20) -> List[Dict[str, Any]]:
+    """Deterministic tracks for a query, so repeated queries return the same list."""
+    rng = random.Random(json.dumps(params, sort_keys=True))
+    genres = [g for g in params.get("genres", "").split(",") if g] or ["pop"]
+    tracks = []
+    for i in range(count):
+        seconds = rng.randint(150, 300)
+        tracks.append({
+            "title": f"{rng.choice(_WORDS)} {rng.choice(_WORDS)}",
+            "artist": f"{rng.choice(_NAMES)} {rng.choice(_WORDS)}",
+            "genres": [rng.choice(genres)],
+            "duration": f"{seconds // 60}:{seconds % 60:02d}",
+            "spotify_url": f"https://open.spotify.com/track/{rng.getrandbits(64):016x}",
+        })
+    return tracks
+
+
+class FixtureSite:
+    """The stand-in site running on a background thread."""
+
+    def __init__(self, port: int = 0, delay_ms: float = 800) -> None:
+        self.delay_ms = delay_ms
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                url = urlparse(self.path)
+                if url.path == "/api/recommendations":
+                    time.sleep(site.delay_ms / 1000)
+                    params = {k: v[0] for k, v in parse_qs(url.query).items()}
+                    self._send(200, "application/json", json.dumps({"tracks": recommendations(params)}).encode())
+                elif url.path in ("/", "/index.html"):
+                    self._send(200, "text/html; charset=utf-8", PAGE.read_bytes())
+                else:
+                    self._send(404, "text/plain", b"not found")
+
+            def _send(self, status: int, content_type: str, body: bytes) -> None:
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format: str, *args: Any) -> None:
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def start(self) -> "FixtureSite":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=800)
+    args = parser.parse_args()
+    site = FixtureSite(port=args.port, delay_ms=args.delay_ms).start()
+    print(f"Serving {site.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        site.stop()
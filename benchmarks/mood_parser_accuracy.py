@@ -0,0 +1,97 @@
+"""Accuracy and latency of the local mood parser (src/mood_parser.py).
+
+Runs the parser over the labeled descriptions in
+benchmarks/fixtures/mood_descriptions.jsonl. Lines with "defer": true are ambiguous
+on purpose and should go to the LLM; the others list the expected mood (or null),
+genres and slider levels (energy_level, happiness_level; null when unset). A
+description counts as correct when the parser is confident (confidence >=
+threshold), its mood and genre set match the label and each level is set exactly
+when labeled and within --level-tolerance points of it. Lines with "held_out": true
+were written after the lexicon was tuned; their share of correct answers is
+reported on its own.
+
+Usage:
+    python -m benchmarks.mood_parser_accuracy [--threshold 0.75] [--level-tolerance 5] [--verbose]
+"""
+import json
+import time
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.mood_parser import MOOD_PARSER_THRESHOLD, parse_mood
+from src.timing import percentile
+
+CASES = Path(__file__).parent / "fixtures" / "mood_descriptions.jsonl"
+
+
+def _level_ok(actual: Optional[int], expected: Optional[int], tolerance: int) -> bool:
+    if actual is None or expected is None:
+        return actual is expected
+    return abs(actual - expected) <= tolerance
+
+
+def evaluate(cases: List[Dict[str, Any]], threshold: float, level_tolerance: int = 5,
+             verbose: bool = False) -> Dict[str, Any]:
+    labeled = [c for c in cases if not c.get("defer")]
+    ambiguous = [c for c in cases if c.get("defer")]
+    answered = correct = false_confident = 0
+    held_out = held_out_ok = 0
+    for case in cases:
+        parse = parse_mood(case["description"])
+        confident = parse.confidence >= threshold
+        query = parse.query
+        if case.get("defer"):
+            ok = not confident
+            false_confident += confident
+        else:
+            answered += confident
+            ok = (confident and query.mood == case["mood"] and set(query.genres or []) == set(case["genres"])
+                  and _level_ok(query.energy_level, case["energy_level"], level_tolerance)
+                  and _level_ok(query.happiness_level, case["happiness_level"], level_tolerance))
+            correct += ok
+        if case.get("held_out"):
+            held_out += 1
+            held_out_ok += ok
+        if verbose:
+            print(f"{'ok ' if ok else 'BAD'} {parse.confidence:.2f} {query.model_dump(exclude_none=True)} "
+                  f"<- {case['description']}")
+
+    # Latency over the whole set, repeated for stable percentiles
+    samples = []
+    for _ in range(50):
+        for case in cases:
+            start = time.perf_counter()
+            parse_mood(case["description"])
+            samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+
+    return {
+        "threshold": threshold,
+        "level_tolerance": level_tolerance,
+        "cases": len(cases),
+        # Share of clear-cut descriptions answered without the LLM
+        "coverage": answered / len(labeled),
+        # Share of the locally answered descriptions that match their label
+        "precision": correct / answered if answered else 0.0,
+        "accuracy": correct / len(labeled),
+        # Ambiguous descriptions the parser wrongly kept from the LLM
+        "false_confident": false_confident,
+        "ambiguous": len(ambiguous),
+        # Cases not used to tune the lexicon, ambiguous ones included
+        "held_out": held_out,
+        "held_out_accuracy": held_out_ok / held_out if held_out else 0.0,
+        "latency_us": {"mean": sum(samples) / len(samples), "p50": percentile(samples, 50),
+                       "p99": percentile(samples, 99), "max": samples[-1]},
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=MOOD_PARSER_THRESHOLD)
+    parser.add_argument("--level-tolerance", type=int, default=5, help="Allowed slider level error in points")
+    parser.add_argument("--cases", type=Path, default=CASES)
+    parser.add_argument("--verbose", action="store_true", help="Print every case")
+    args = parser.parse_args()
+
+    cases = [json.loads(line) for line in args.cases.read_text().splitlines() if line.strip()]
+    print(json.dumps(evaluate(cases, args.threshold, args.level_tolerance, args.verbose), indent=2))
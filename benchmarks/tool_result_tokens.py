@@ -0,0 +1,70 @@
+"""Prompt tokens of the music tool results, before and after the compact encoding.
+
+Builds `--songs` deterministic songs (the fixture site's recommendations) and
+counts the tokens of what each model hop receives:
+
+- music_retriever -> approver: the tool result, formerly the repr of the Song list
+- search_music_for_user -> chat agent: formerly the approver's formatted list of
+  every song, now `encode_songs` limited to the top K
+
+Tokens are counted with tiktoken (o200k_base, the gpt-4o-mini encoding). When the
+encoding cannot be loaded (it is downloaded on first use) a word/punctuation
+estimate is used and the report says so.
+
+Usage:
+    python -m benchmarks.tool_result_tokens [--songs 20] [--top-k 10]
+"""
+import re
+import json
+import argparse
+from typing import Callable, Dict, List, Tuple
+from src.tools import Song, encode_songs
+from benchmarks.fixture_site import recommendations
+
+
+def _songs(count: int) -> List[Song]:
+    tracks = recommendations({"mood": "Happy", "genres": "pop,dance"}, count=count)
+    return [Song(title=t["title"], artist=t["artist"], link=t["spotify_url"],
+                 extra={"genres": t["genres"], "duration": t["duration"]}) for t in tracks]
+
+
+def _approver_text(songs: List[Song]) -> str:
+    """What the approver answered with (and the chat agent received) before."""
+    lines = ["🎵 Here are some great songs for you:", ""]
+    for i, song in enumerate(songs, 1):
+        extra = song.extra or {}
+        lines.append(f"{i}. {song.title} - {song.artist} ({', '.join(extra.get('genres', []))} | {extra.get('duration')})")
+    return "\n".join(lines) + "\n\nAPPROVED"
+
+
+def _tokenizer() -> Tuple[Callable[[str], int], str]:
+    try:
+        import tiktoken
+        encoding = tiktoken.get_encoding("o200k_base")
+        return (lambda text: len(encoding.encode(text))), "tiktoken o200k_base"
+    except Exception:
+        words = re.compile(r"\w+|[^\w\s]")
+        return (lambda text: len(words.findall(text))), "estimate (tiktoken encoding unavailable)"
+
+
+def measure(song_count: int, top_k: int) -> Dict[str, object]:
+    count, tokenizer = _tokenizer()
+    songs = _songs(song_count)
+    hops = {
+        "retriever_to_approver": (str(songs), encode_songs(songs, top_k)),
+        "tool_to_chat_agent": ("MUSIC_SEARCH_RESULTS: " + _approver_text(songs),
+                               "MUSIC_SEARCH_RESULTS: " + encode_songs(songs, top_k)),
+    }
+    report: Dict[str, object] = {"tokenizer": tokenizer, "songs": song_count, "top_k": top_k}
+    for hop, (before, after) in hops.items():
+        b, a = count(before), count(after)
+        report[hop] = {"before": b, "after": a, "saved": b - a, "reduction": round(1 - a / b, 3)}
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--songs", type=int, default=20, help="Songs returned by the search")
+    parser.add_argument("--top-k", type=int, default=10, help="MUSIC_TOOL_TOP_K")
+    args = parser.parse_args()
+    print(json.dumps(measure(args.songs, args.top_k), indent=2))
@@ -1,40 +1,134 @@
 import os
+import asyncio
 import logging
 from dotenv import load_dotenv
 load_dotenv()
 
-import json
-import aiofiles
 import agentops
 
 from pathlib import Path
-from typing import Any
+from typing import Any, Optional
+from contextlib import asynccontextmanager
 
 from autogen_core import CancellationToken
-from autogen_agentchat.messages import TextMessage
+from autogen_agentchat.base import Response
+from autogen_agentchat.messages import ModelClientStreamingChunkEvent, TextMessage
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Query, WebSocket, WebSocketDisconnect
 
-from src.utils import get_chat_agent, get_history
+from src.utils import get_chat_agent, get_model_client
+from src.storage import ChatHistoryLog, ChatStateStore
+from src.persistence import PersistenceWorker
+from src.teams import close_team_model_client, get_llm_cache_stats, get_music_team_pool
+from src.timing import span
+from src.metrics import CHATTUNE_METRICS, CONTENT_TYPE, enable_metrics, get_metrics
+from src.progress import reset_progress_sink, set_progress_sink
+from src.tools import ScraperPool, set_scraper_pool, set_scraper_workers, get_scraper_workers, get_music_cache, get_music_catalog, get_search_flights
+from src.workers import ScraperWorkerPool
 
 # Initialize paths
-model_config_path = Path("model_config.yaml")
-state_path = Path("chat_agent_state.json")
-history_path = Path("chat_agent_history.json")
+model_config_path = Path(os.getenv("MODEL_CONFIG_PATH", "model_config.yaml"))
+state_db_path = Path(os.getenv("CHAT_STATE_DB", "chat_state.sqlite3"))
+
+# Scraper pool settings (SCRAPER_POOL_SIZE=0 launches a browser per search instead)
+SCRAPER_POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "2"))
+SCRAPER_POOL_MAX_USES = int(os.getenv("SCRAPER_POOL_MAX_USES", "25"))
+
+# Scraper worker processes (SCRAPER_WORKERS>0 runs searches out of process instead of the pool)
+SCRAPER_WORKERS = int(os.getenv("SCRAPER_WORKERS", "0"))
+SCRAPER_WORKER_TIMEOUT = float(os.getenv("SCRAPER_WORKER_TIMEOUT", "60"))
+
+# Stream model tokens to the client (CHAT_STREAMING=0 sends only the final reply)
+CHAT_STREAMING = os.getenv("CHAT_STREAMING", "1") == "1"
+
+# Messages received during a turn: "queue" runs them afterwards, "supersede" cancels
+# the turn in progress and runs only the newest one
+CHAT_BUSY_POLICY = os.getenv("CHAT_BUSY_POLICY", "queue")
+
+# Number of newest context messages loaded when a session reconnects
+CHAT_STATE_MAX_MESSAGES = int(os.getenv("CHAT_STATE_MAX_MESSAGES", "200"))
+
+# SQLite fsync policy of the chat database: OFF, NORMAL or FULL
+CHAT_STATE_SYNC = os.getenv("CHAT_STATE_SYNC", "NORMAL")
+
+# Part of the conversation sent to the model each turn: "all", "window" (newest
+# CHAT_CONTEXT_MAX_MESSAGES), "tokens" (newest turns within CHAT_CONTEXT_TOKEN_BUDGET)
+# or "summary" (the window plus a rolling summary of older messages)
+CHAT_CONTEXT_POLICY = os.getenv("CHAT_CONTEXT_POLICY", "window")
+CHAT_CONTEXT_MAX_MESSAGES = int(os.getenv("CHAT_CONTEXT_MAX_MESSAGES", "40"))
+CHAT_CONTEXT_TOKEN_BUDGET = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "4000"))
+
+# Agent state and UI transcript of every chat session, written behind the replies
+# (opened by lifespan, so importing this module creates no database)
+state_store: Optional[ChatStateStore] = None
+history_log: Optional[ChatHistoryLog] = None
+persistence: Optional[PersistenceWorker] = None
 
 # Initialize logger
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Initialize AgentOps
 AGENTOPS_API_KEY = os.getenv("AGENTOPS_API_KEY") 
-agentops.init(AGENTOPS_API_KEY) 
+
+# Process-wide setup lives in lifespan, not at import: scraper workers are spawned
+# processes that re-import this module as __mp_main__ and must not repeat it
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start long-lived resources once and release them on shutdown."""
+    global state_store, history_log, persistence
+    # Initialize AgentOps
+    agentops.init(AGENTOPS_API_KEY)
+    # Stage latency histograms for /metrics (spans cost nothing while this is off)
+    if CHATTUNE_METRICS:
+        enable_metrics()
+    state_store = ChatStateStore(state_db_path, synchronous=CHAT_STATE_SYNC)
+    history_log = ChatHistoryLog(state_db_path, synchronous=CHAT_STATE_SYNC)
+    persistence = PersistenceWorker(state_store, history_log).start()
+    # Build the music teams and their shared model client before the first search
+    music_teams = get_music_team_pool()
+    try:
+        await music_teams.start()
+    except Exception as e:
+        logger.error(f"Failed to build the music teams, building them on demand: {e}")
+    scraper_pool = None
+    scraper_workers = None
+    if SCRAPER_WORKERS > 0:
+        try:
+            scraper_workers = await ScraperWorkerPool(size=SCRAPER_WORKERS,
+                                                      job_timeout=SCRAPER_WORKER_TIMEOUT,
+                                                      max_uses=SCRAPER_POOL_MAX_USES).start()
+            set_scraper_workers(scraper_workers)
+        except Exception as e:
+            logger.error(f"Failed to start scraper workers, searching in process: {e}")
+            scraper_workers = None
+    if scraper_workers is None and SCRAPER_POOL_SIZE > 0:
+        try:
+            scraper_pool = await ScraperPool(size=SCRAPER_POOL_SIZE,
+                                             max_uses=SCRAPER_POOL_MAX_USES).start()
+            set_scraper_pool(scraper_pool)
+        except Exception as e:
+            logger.error(f"Failed to start scraper pool, falling back to per-search browsers: {e}")
+            scraper_pool = None
+    try:
+        yield
+    finally:
+        if scraper_workers is not None:
+            set_scraper_workers(None)
+            await scraper_workers.stop()
+        if scraper_pool is not None:
+            set_scraper_pool(None)
+            await scraper_pool.stop()
+        await close_team_model_client()
+        # Drain the chat writes still queued
+        await persistence.stop()
+        state_store.close()
+        history_log.close()
 
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -54,69 +148,178 @@ async def root():
     return FileResponse("chat_ui.html")
 
 @app.get("/history")
-async def history() -> list[dict[str, Any]]:
+async def history(session: str = "default",
+                  limit: int = Query(50, ge=1, le=500),
+                  before: Optional[int] = None) -> list[dict[str, Any]]:
+    """Page of a session's history, oldest first. Pass the smallest `id` of a page
+    as `before` to get the page preceding it."""
     try:
-        return await get_history(history_path)
+        await persistence.join()
+        with span("history_load"):
+            return await history_log.page(session, limit=limit, before=before)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e)) from e
 
+@app.get("/stats")
+async def stats() -> dict[str, Any]:
+    """Runtime counters of the caches and pools."""
+    music_cache = get_music_cache()
+    music_catalog = get_music_catalog()
+    scraper_workers = get_scraper_workers()
+    return {
+        "music_catalog": music_catalog.stats() if music_catalog else None,
+        "music_cache": music_cache.stats() if music_cache else None,
+        "music_search_flights": get_search_flights().stats(),
+        "scraper_workers": scraper_workers.stats() if scraper_workers else None,
+        "persistence": persistence.stats(),
+        "llm_cache": get_llm_cache_stats(),
+        "music_teams": get_music_team_pool().stats(),
+    }
+
+@app.get("/metrics")
+async def metrics() -> PlainTextResponse:
+    """Stage latency histograms in the Prometheus text format (needs CHATTUNE_METRICS=1)."""
+    histograms = get_metrics()
+    if histograms is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled; set CHATTUNE_METRICS=1")
+    return PlainTextResponse(histograms.render(), media_type=CONTENT_TYPE)
+
 # WebSocket endpoint for chat
 @app.websocket("/ws/chat")
 async def chat(websocket: WebSocket):
     # Wait for connection
     await websocket.accept()
-    
-    try:
+    session_id = websocket.query_params.get("session", "default")
+
+    # Publish music pipeline progress events to this connection
+    async def send_progress(event: dict[str, Any]) -> None:
+        await websocket.send_json(event)
+    progress_token = set_progress_sink(send_progress)
+
+    # Messages waiting for their turn, and the token and task of the turn in progress
+    turns: asyncio.Queue[TextMessage] = asyncio.Queue()
+    current_turn: Optional[CancellationToken] = None
+    turn_task: Optional[asyncio.Task] = None
+
+    # Stop the turn in progress. The token stops the music team and scraper; the task
+    # is cancelled too, because the agent does not return from a tool call whose
+    # future the token cancelled
+    def cancel_turn() -> None:
+        if current_turn is not None:
+            current_turn.cancel()
+        if turn_task is not None:
+            turn_task.cancel()
+
+    # Read client messages while a turn runs, so "cancel" and disconnects are seen at once
+    async def receive_turns() -> None:
         while True:
-            # Get user message from client
             data = await websocket.receive_json()
+            if data.get("type") == "cancel":
+                cancel_turn()
+                continue
             # Create a TextMessage with the content from the client
             request = TextMessage(content=data.get('content', ''), source=data.get('source', 'user'))
+            if CHAT_BUSY_POLICY == "supersede":
+                # The newest message replaces the turn in progress and any waiting ones
+                while not turns.empty():
+                    turns.get_nowait()
+                cancel_turn()
+            turns.put_nowait(request)
 
-            # Create agent
-            chat_agent = await get_chat_agent(model_config_path,
-                                                    state_path)
+    # Run turns one at a time in arrival order
+    async def process_turns() -> None:
+        nonlocal current_turn, turn_task
+        while True:
+            request = await turns.get()
+            current_turn = CancellationToken()
+            # Context to restore if the turn is cancelled half-way (e.g. after a tool call request)
+            context_state = await chat_agent.model_context.save_state()
+            # Each turn runs in its own task so cancel_turn can stop it at any await
+            turn_task = asyncio.create_task(run_turn(request, current_turn))
+            try:
+                with span("turn"):
+                    await turn_task
+            except asyncio.CancelledError:
+                # Re-raise when this loop itself is cancelled (disconnect), not just the turn
+                if asyncio.current_task().cancelling():
+                    raise
+                await chat_agent.model_context.load_state(context_state)
+                await websocket.send_json({"type": "cancelled", "source": "assistant"})
+            finally:
+                current_turn = None
+                turn_task = None
 
-            # Generate response            
-            response = await chat_agent.on_messages(messages=[request],
-                                                    cancellation_token=CancellationToken())
+    async def run_turn(request: TextMessage, cancellation_token: CancellationToken) -> None:
+        # Generate response, forwarding partial tokens as they arrive
+        response = None
+        async for event in chat_agent.on_messages_stream(messages=[request],
+                                                         cancellation_token=cancellation_token):
+            if isinstance(event, Response):
+                response = event
+            elif isinstance(event, ModelClientStreamingChunkEvent):
+                await websocket.send_json({
+                    "type": "chunk",
+                    "content": event.content,
+                    "source": "assistant"
+                })
 
-            # Debug: Log the response structure
-            logger.info(f"Response type: {type(response)}")
-            logger.info(f"Response attributes: {dir(response)}")
-            
-            # Save agent state to file.
+        # Extract response content safely
+        response_content = "I'm sorry, I couldn't generate a response."
+
+        # Extract response content from response 
+        try:
+            response_content = response.chat_message.content
+        except Exception as e:
+            logger.error(f"Error extracting response content: {e}")
+
+        # Send response back to client
+        response_data = {
+            "type": "final",
+            "content": response_content,
+            "source": "assistant"
+        }
+
+        # Send response back to client
+        await websocket.send_json(response_data)
+
+        # Fold messages that left the context window into the rolling summary
+        try:
+            await chat_agent.model_context.summarize()
+        except Exception as e:
+            logger.error(f"Error summarizing context: {e}")
+
+        # Queue the new agent state and history entries; the worker writes them behind the reply
+        with span("state_snapshot"):
             state = await chat_agent.save_state()
-            async with aiofiles.open(state_path, "w") as file:
-                await file.write(json.dumps(state, default=str))
+        persistence.save_state(session_id, state)
+        persistence.append_history(session_id, [
+            {"content": request.content, "source": "user"},
+            {"content": response_content, "source": "assistant"},
+        ])
 
-            # Extract response content safely
-            response_content = "I'm sorry, I couldn't generate a response."
-            
-            # Extract response content from response 
-            try:
-                response_content = response.chat_message.content
-            except Exception as e:
-                logger.error(f"Error extracting response content: {e}")
-
-            # Save chat history to file.
-            history = await get_history(history_path)
-            # Add user message to history
-            history.append({"content": request.content, "source": "user"})
-            # Add assistant response to history
-            history.append({"content": response_content, "source": "assistant"})
-
-            async with aiofiles.open(history_path, "w") as file:
-                await file.write(json.dumps(history, default=str))
-
-            # Send response back to client
-            response_data = {
-                "content": response_content,
-                "source": "assistant"
-            }
-
-            # Send response back to client
-            await websocket.send_json(response_data)
+    # Create the model client and agent once and reuse them for every turn
+    model_client = None
+    tasks: list[asyncio.Task] = []
+    try:
+        with span("agent_build"):
+            model_client = await get_model_client(model_config_path)
+            # A reconnecting session must see the writes of its previous connection
+            await persistence.join()
+            chat_agent = await get_chat_agent(model_config_path,
+                                              state_store,
+                                              session_id,
+                                              model_client=model_client,
+                                              max_messages=CHAT_STATE_MAX_MESSAGES,
+                                              stream=CHAT_STREAMING,
+                                              context_policy=CHAT_CONTEXT_POLICY,
+                                              context_max_messages=CHAT_CONTEXT_MAX_MESSAGES,
+                                              context_token_budget=CHAT_CONTEXT_TOKEN_BUDGET)
+
+        # Run until the client disconnects or a turn fails
+        tasks = [asyncio.create_task(receive_turns()), asyncio.create_task(process_turns())]
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
             
     except WebSocketDisconnect:
         logger.info("Client disconnected")
@@ -126,6 +329,15 @@ async def chat(websocket: WebSocket):
             await websocket.close()
         except:
             pass
+    finally:
+        # Stop the turn in progress, including its music search and browser page
+        cancel_turn()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        reset_progress_sink(progress_token)
+        if model_client is not None:
+            await model_client.close()
 
 if __name__ == "__main__":
 
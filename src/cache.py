@@ -0,0 +1,361 @@
+import json
+import time
+import sqlite3
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from dataclasses import dataclass
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, TypeVar
+from pydantic import BaseModel
+from autogen_core import CacheStore
+from src.models import MusicSearchQuery
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+
+class MusicSearchCache:
+    """Two-tier cache of music search results keyed on a normalized MusicSearchQuery.
+
+    Lookups go to an in-memory LRU first and then to an SQLite file that survives
+    restarts. Entries expire `ttl_seconds` after they were stored. Results are kept as
+    plain dicts so the cache does not depend on the scraper's types.
+    """
+
+    def __init__(self,
+                 path: Optional[Path] = Path("music_cache.sqlite3"),
+                 max_entries: int = 256,
+                 ttl_seconds: float = 24 * 3600,
+                 granularity: int = 10) -> None:
+        """
+        Args:
+        - path: SQLite file for the disk tier, or None to keep the cache in memory only
+        - max_entries: Capacity of the in-memory LRU tier
+        - ttl_seconds: Time to live of an entry in both tiers
+        - granularity: Bucket size for the energy/happiness sliders
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.granularity = granularity
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.expired = 0
+        if path is not None:
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS music_search_cache ("
+                "key TEXT PRIMARY KEY, songs TEXT NOT NULL, "
+                "query_limit INTEGER NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM music_search_cache WHERE created_at < ?",
+                             (time.time() - ttl_seconds,))
+            self._db.commit()
+
+    def key(self, query: MusicSearchQuery) -> str:
+        return query.cache_key(self.granularity)
+
+    def _usable(self, entry: Dict[str, Any], limit: int) -> bool:
+        # An entry fetched with a smaller limit can only serve a larger one if it was exhaustive
+        return entry["limit"] >= limit or len(entry["songs"]) < entry["limit"]
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[Dict[str, Any]]:
+        assert self._db
+        with self._lock:
+            row = self._db.execute(
+                "SELECT songs, query_limit, created_at FROM music_search_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"songs": json.loads(row[0]), "limit": row[1], "created_at": row[2]}
+
+    def _disk_put(self, key: str, entry: Dict[str, Any]) -> None:
+        assert self._db
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO music_search_cache (key, songs, query_limit, created_at) "
+                "VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry["songs"]), entry["limit"], entry["created_at"]),
+            )
+            self._db.commit()
+
+    def _disk_delete(self, key: str) -> None:
+        assert self._db
+        with self._lock:
+            self._db.execute("DELETE FROM music_search_cache WHERE key = ?", (key,))
+            self._db.commit()
+
+    async def get(self, query: MusicSearchQuery, limit: int) -> Optional[List[Dict[str, Any]]]:
+        """Return cached songs for the query, or None on a miss."""
+        key = self.key(query)
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            if now - entry["created_at"] > self.ttl_seconds:
+                self._memory.pop(key, None)
+                self.expired += 1
+            elif self._usable(entry, limit):
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return entry["songs"][:limit]
+
+        if self._db is not None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                if now - entry["created_at"] > self.ttl_seconds:
+                    self.expired += 1
+                    await asyncio.to_thread(self._disk_delete, key)
+                elif self._usable(entry, limit):
+                    self._remember(key, entry)
+                    self.disk_hits += 1
+                    return entry["songs"][:limit]
+
+        self.misses += 1
+        return None
+
+    async def put(self, query: MusicSearchQuery, limit: int, songs: List[Dict[str, Any]]) -> None:
+        """Store songs fetched for the query with the given limit."""
+        key = self.key(query)
+        entry = {"songs": songs, "limit": limit, "created_at": time.time()}
+        self._remember(key, entry)
+        if self._db is not None:
+            await asyncio.to_thread(self._disk_put, key, entry)
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.memory_hits + self.disk_hits
+        total = hits + self.misses
+        return {
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "hit_rate": hits / total if total else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def close(self) -> None:
+        if self._db is not None:
+            with self._lock:
+                self._db.close()
+            self._db = None
+
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Coalesce concurrent calls with the same key into one shared task.
+
+    Callers await the shared task through a shield, so one caller being cancelled
+    (e.g. its WebSocket disconnected) does not cancel the work for the others. The
+    shared task is cancelled only when its last caller is gone.
+    """
+
+    def __init__(self) -> None:
+        self._flights: Dict[str, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    def _finish(self, key: str, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not flight.task.cancelled():
+            # Mark the exception as retrieved in case every caller left early
+            flight.task.exception()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await `fn()`, sharing one in-flight call among callers with the same key."""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.ensure_future(fn()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _, key=key, flight=flight: self._finish(key, flight))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to use the result; later callers start a fresh call
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def in_flight(self, key: str) -> bool:
+        """Whether a call for `key` is running that new callers would join."""
+        return key in self._flights
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+class LLMResponseStore(CacheStore[Any]):
+    """SQLite CacheStore for autogen's ChatCompletionCache, with TTL and size bounds.
+
+    ChatCompletionCache keys entries on the request (messages, tools, JSON schema,
+    extra arguments) but not on the model, so each agent/model pair gets its own
+    `namespace`. Values are stored as JSON and handed back as dicts, which
+    ChatCompletionCache turns into CreateResults again. Once a namespace holds more
+    than `max_entries`, its oldest entries are evicted.
+
+    ChatCompletionCache calls `get` and `set` synchronously on the event loop, so
+    `set` only records the entry in memory and writes it on a worker thread; `get`
+    answers pending entries from memory. Commits use WAL with synchronous=NORMAL,
+    which does not fsync each response.
+    """
+
+    def __init__(self,
+                 path: Path = Path("llm_cache.sqlite3"),
+                 namespace: str = "default",
+                 ttl_seconds: float = 7 * 24 * 3600,
+                 max_entries: int = 10000) -> None:
+        """
+        Args:
+        - path: SQLite file shared by all namespaces
+        - namespace: Partition of the cache, e.g. "mood_detector:gpt-4o-mini"
+        - ttl_seconds: Time to live of an entry
+        - max_entries: Capacity of the namespace
+        """
+        self.path = path
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        # Entries set but not yet on disk, and the writes putting them there
+        self._pending: Dict[str, tuple] = {}
+        self._writes: set = set()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS llm_cache_age ON llm_cache (namespace, created_at)")
+        self._db.execute("DELETE FROM llm_cache WHERE namespace = ? AND created_at < ?",
+                         (namespace, time.time() - ttl_seconds))
+        self._db.commit()
+        (self._entries,) = self._db.execute(
+            "SELECT COUNT(*) FROM llm_cache WHERE namespace = ?", (namespace,)
+        ).fetchone()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _dump(value: Any) -> str:
+        # A CreateResult, or a streamed list of text chunks ending with one
+        if isinstance(value, list):
+            return json.dumps([v.model_dump(mode="json") if isinstance(v, BaseModel) else v for v in value])
+        if isinstance(value, BaseModel):
+            return value.model_dump_json()
+        return json.dumps(value)
+
+    def get(self, key: str, default: Optional[Any] = None) -> Optional[Any]:
+        row = self._pending.get(key)
+        if row is None:
+            # A point read on the primary key; it never waits for an fsync
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT value, created_at FROM llm_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+                ).fetchone()
+        if row is not None and time.time() - row[1] > self.ttl_seconds:
+            # Left for the next set of the key (or the purge at startup) to replace
+            self.expired += 1
+            row = None
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, value: Any) -> None:
+        row = (self._dump(value), time.time())
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._write(key, *row)
+            return
+        self._pending[key] = row
+        write = loop.run_in_executor(None, self._write, key, *row)
+        self._writes.add(write)
+        write.add_done_callback(lambda future, key=key, row=row: self._written(future, key, row))
+
+    def _written(self, write: "asyncio.Future[None]", key: str, row: tuple) -> None:
+        self._writes.discard(write)
+        if self._pending.get(key) is row:
+            del self._pending[key]
+        if not write.cancelled() and write.exception() is not None:
+            logger.warning(f"LLM cache write failed: {write.exception()}")
+
+    async def flush(self) -> None:
+        """Wait until every entry set so far is on disk."""
+        if self._writes:
+            await asyncio.gather(*self._writes, return_exceptions=True)
+
+    def _write(self, key: str, value: str, created_at: float) -> None:
+        with self._lock:
+            replaced = self._db.execute(
+                "SELECT 1 FROM llm_cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+            ).fetchone()
+            # Writes of one key may finish out of order; the newest entry wins
+            self._db.execute(
+                "INSERT INTO llm_cache (namespace, key, value, created_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (namespace, key) DO UPDATE SET value = excluded.value, "
+                "created_at = excluded.created_at WHERE excluded.created_at >= llm_cache.created_at",
+                (self.namespace, key, value, created_at),
+            )
+            if replaced is None:
+                self._entries += 1
+            if self._entries > self.max_entries:
+                excess = self._entries - self.max_entries
+                self._db.execute(
+                    "DELETE FROM llm_cache WHERE rowid IN (SELECT rowid FROM llm_cache "
+                    "WHERE namespace = ? ORDER BY created_at LIMIT ?)",
+                    (self.namespace, excess),
+                )
+                self._entries -= excess
+                self.evicted += excess
+            self._db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "expired": self.expired,
+            "evicted": self.evicted,
+            "hit_rate": self.hits / total if total else 0.0,
+            "entries": self._entries,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
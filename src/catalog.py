@@ -0,0 +1,152 @@
+import json
+import time
+import logging
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.models import MusicSearchQuery, MoodEnum, GenreEnum
+
+logger = logging.getLogger(__name__)
+
+MOODS = [m.value for m in MoodEnum]
+GENRES = [g.value for g in GenreEnum]
+_MOOD_INDEX = {m: i for i, m in enumerate(MOODS)}
+# The site shows genres in lower case; accept both spellings
+_GENRE_INDEX = {**{g: i for i, g in enumerate(GENRES)}, **{g.lower(): i for i, g in enumerate(GENRES)}}
+
+# Distance added when a song does not match the requested mood / any requested genre.
+# Slider distances are in [0, 1] each, so a mismatch always ranks below a match.
+MOOD_MISMATCH = 1.0
+GENRE_MISMATCH = 1.0
+
+
+class CatalogIndex:
+    """In-memory, NumPy-backed index over a precrawled song catalog.
+
+    Every row is a song together with the coordinates (mood, energy, happiness,
+    genre) of the grid query that produced it. `search` ranks all rows by their
+    distance to a MusicSearchQuery in one vectorized pass and returns None when the
+    nearest row is further than `max_distance`, i.e. the catalog does not cover the
+    query and the caller should scrape the live site instead.
+    """
+
+    def __init__(self, songs: List[Dict[str, Any]], crawled_at: float, step: int = 25,
+                 max_distance: Optional[float] = None, mtime: Optional[float] = None) -> None:
+        self.songs = songs
+        self.crawled_at = crawled_at
+        self.step = step
+        # Default coverage: within one grid step on the sliders, same mood and genre
+        self.max_distance = max_distance if max_distance is not None else step / 100
+        self.mtime = mtime
+        self.hits = 0
+        self.misses = 0
+
+        n = len(songs)
+        self._mood = np.full(n, -1, dtype=np.int8)
+        self._levels = np.zeros((n, 2), dtype=np.float32)
+        self._genres = np.zeros((n, len(GENRES)), dtype=bool)
+        for i, song in enumerate(songs):
+            self._mood[i] = _MOOD_INDEX.get(song.get("mood"), -1)
+            self._levels[i] = (song.get("energy", 50) / 100, song.get("happiness", 50) / 100)
+            labels = list((song.get("extra") or {}).get("genres") or [])
+            if song.get("genre"):
+                labels.append(song["genre"])
+            for label in labels:
+                idx = _GENRE_INDEX.get(label)
+                if idx is not None:
+                    self._genres[i, idx] = True
+
+    @classmethod
+    def load(cls, path: Path, max_distance: Optional[float] = None) -> "CatalogIndex":
+        data = json.loads(path.read_text())
+        return cls(data["songs"], crawled_at=data["crawled_at"], step=data.get("step", 25),
+                   max_distance=max_distance, mtime=path.stat().st_mtime)
+
+    @property
+    def age_seconds(self) -> float:
+        return time.time() - self.crawled_at
+
+    def distances(self, query: MusicSearchQuery) -> np.ndarray:
+        """Distance of every catalog row to the query; unset fields are ignored."""
+        dist = np.zeros(len(self.songs), dtype=np.float32)
+        if query.mood:
+            dist += MOOD_MISMATCH * (self._mood != _MOOD_INDEX.get(str(query.mood), -2))
+        if query.energy_level is not None:
+            dist += np.abs(self._levels[:, 0] - query.energy_level / 100)
+        if query.happiness_level is not None:
+            dist += np.abs(self._levels[:, 1] - query.happiness_level / 100)
+        if query.genres:
+            wanted = [_GENRE_INDEX[str(g)] for g in query.genres if str(g) in _GENRE_INDEX]
+            dist += GENRE_MISMATCH * ~self._genres[:, wanted].any(axis=1)
+        return dist
+
+    def search(self, query: MusicSearchQuery, limit: int = 20) -> Optional[List[Dict[str, Any]]]:
+        """Return up to `limit` distinct songs nearest to the query, or None if not covered."""
+        if not self.songs:
+            self.misses += 1
+            return None
+        dist = self.distances(query)
+        if dist.min() > self.max_distance:
+            self.misses += 1
+            return None
+
+        # Sort only a candidate window; fall back to a full sort when duplicates across
+        # grid cells leave it short of `limit` distinct songs
+        window = min(len(dist), limit * 8)
+        candidates = np.argpartition(dist, window - 1)[:window]
+        results = self._distinct(candidates[np.argsort(dist[candidates], kind="stable")], dist, limit)
+        if len(results) < limit and window < len(dist) and dist[candidates].max() <= self.max_distance:
+            results = self._distinct(np.argsort(dist, kind="stable"), dist, limit)
+        self.hits += 1
+        return results
+
+    def _distinct(self, order: np.ndarray, dist: np.ndarray, limit: int) -> List[Dict[str, Any]]:
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        for i in order:
+            if dist[i] > self.max_distance or len(results) >= limit:
+                break
+            song = self.songs[i]
+            key = (song["title"], song.get("artist"))
+            if key in seen:
+                continue
+            seen.add(key)
+            results.append({k: song.get(k) for k in ("title", "artist", "link", "extra")})
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "songs": len(self.songs),
+            "age_seconds": self.age_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+_catalog: Optional[CatalogIndex] = None
+_failed_mtime: Optional[float] = None
+
+
+def get_catalog(path: Path, max_age_seconds: float) -> Optional[CatalogIndex]:
+    """Catalog at `path`, reloaded when the file changes.
+
+    Returns None when the file is missing or older than `max_age_seconds`, so stale
+    data is never served and searches fall back to the live site.
+    """
+    global _catalog, _failed_mtime
+    try:
+        mtime = path.stat().st_mtime
+    except OSError:
+        return None
+    if _catalog is None or _catalog.mtime != mtime:
+        if mtime == _failed_mtime:
+            return None
+        try:
+            _catalog = CatalogIndex.load(path)
+        except Exception as e:
+            logger.error(f"Failed to load music catalog {path}: {e}")
+            _failed_mtime = mtime
+            return None
+    if _catalog.age_seconds > max_age_seconds:
+        return None
+    return _catalog
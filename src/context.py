@@ -0,0 +1,209 @@
+import re
+from typing import Any, List, Mapping, Optional
+from autogen_core.model_context import ChatCompletionContext
+from autogen_core.models import (
+    ChatCompletionClient,
+    FunctionExecutionResult,
+    FunctionExecutionResultMessage,
+    LLMMessage,
+    SystemMessage,
+    UserMessage,
+)
+
+# Context policies: "all" sends the whole conversation, "window" the newest
+# `max_messages`, "tokens" the newest turns within `token_budget`, "summary" the
+# window plus a rolling summary of the messages that fell out of it
+CONTEXT_POLICIES = ("all", "window", "tokens", "summary")
+
+# Prefix of the music tool results (see src.utils.search_music_for_user)
+MUSIC_RESULTS_PREFIX = "MUSIC_SEARCH_RESULTS:"
+# Longest tool result kept verbatim once the turn that used it is over
+COMPACT_RESULT_CHARS = 400
+_SONG_LINE = re.compile(r"^\s*\d+\.\s*(.+?)\s*(\(.*\))?\s*$")
+
+SUMMARY_PROMPT = """
+You maintain a running summary of a supportive conversation between a user and a caring assistant.
+Update the summary with the new messages. Keep what matters for the rest of the conversation:
+the user's feelings and situation, their music preferences, and songs already recommended.
+Answer with the updated summary only, in at most 200 words.
+"""
+
+
+def compact_tool_result(content: str) -> str:
+    """
+    Shorten a tool result the model has already answered
+    Args:
+    - content: Tool result text
+    Returns:
+    - compacted: Song titles only for music results, a truncated text otherwise
+    """
+    if content.startswith(MUSIC_RESULTS_PREFIX):
+        # The first song may share its line with the prefix ("MUSIC_SEARCH_RESULTS: 1. ...")
+        lines = content[len(MUSIC_RESULTS_PREFIX):].splitlines()
+        songs = [m.group(1) for m in map(_SONG_LINE.match, lines) if m]
+        if songs:
+            content = f"{MUSIC_RESULTS_PREFIX} (already shown to the user) " + "; ".join(songs)
+    if len(content) > COMPACT_RESULT_CHARS:
+        content = content[:COMPACT_RESULT_CHARS] + " ...[truncated]"
+    return content
+
+
+class ChatContext(ChatCompletionContext):
+    """Model context of the chat agent with a bounded view of the conversation.
+
+    All messages are kept (and saved) in full; `get_messages`, which builds every
+    prompt, returns only the part selected by `policy`. Tool results of earlier turns
+    are compacted in that view, since the model has already answered them. The view
+    always starts at a user message, so a tool result never loses its call.
+    """
+
+    def __init__(self,
+                 model_client: ChatCompletionClient,
+                 policy: str = "window",
+                 max_messages: int = 40,
+                 token_budget: int = 4000,
+                 compact_tool_results: bool = True,
+                 initial_messages: Optional[List[LLMMessage]] = None) -> None:
+        """
+        Args:
+        - model_client: Client used to count tokens and to write summaries
+        - policy: One of CONTEXT_POLICIES
+        - max_messages: Window size of the "window" and "summary" policies (the turn in
+          progress is kept whole even when longer)
+        - token_budget: Prompt budget of the "tokens" policy
+        - compact_tool_results: Compact the tool results of earlier turns
+        - initial_messages: Messages to start with
+        """
+        if policy not in CONTEXT_POLICIES:
+            raise ValueError(f"policy must be one of {CONTEXT_POLICIES}, got {policy!r}")
+        super().__init__(initial_messages)
+        self.model_client = model_client
+        self.policy = policy
+        self.max_messages = max_messages
+        self.token_budget = token_budget
+        self.compact_tool_results = compact_tool_results
+        # Rolling summary and the number of newest messages it does not cover yet
+        self.summary: Optional[str] = None
+        self._unsummarized = len(self._messages)
+        # Token counts of stored messages, keyed by (id, compacted)
+        self._token_counts: dict[tuple[int, bool], int] = {}
+
+    async def add_message(self, message: LLMMessage) -> None:
+        self._messages.append(message)
+        self._unsummarized += 1
+
+    async def clear(self) -> None:
+        self._messages = []
+        self.summary = None
+        self._unsummarized = 0
+        self._token_counts.clear()
+
+    def _turn_start(self, index: int) -> int:
+        """Index of the first user message at or after `index`."""
+        while index < len(self._messages) and not isinstance(self._messages[index], UserMessage):
+            index += 1
+        return index
+
+    def _window_start(self) -> int:
+        if self.policy == "all":
+            return 0
+        if self.policy == "tokens":
+            return self._budget_start()
+        # Never drop the turn in progress, even when it alone exceeds max_messages
+        return min(self._turn_start(max(0, len(self._messages) - self.max_messages)), self._current_turn())
+
+    def _budget_start(self) -> int:
+        """Oldest turn boundary such that the view fits the token budget."""
+        current = self._current_turn()
+        total = 0
+        start = len(self._messages)
+        for i in range(len(self._messages) - 1, -1, -1):
+            total += self._tokens(i, compacted=i < current)
+            if total > self.token_budget:
+                break
+            if isinstance(self._messages[i], UserMessage):
+                start = i
+        # Never drop the turn in progress
+        return min(start, current)
+
+    def _current_turn(self) -> int:
+        for i in range(len(self._messages) - 1, -1, -1):
+            if isinstance(self._messages[i], UserMessage):
+                return i
+        return 0
+
+    def _tokens(self, index: int, compacted: bool) -> int:
+        message = self._messages[index]
+        key = (id(message), compacted)
+        if key not in self._token_counts:
+            if compacted:
+                message = self._compacted(message)
+            try:
+                self._token_counts[key] = self.model_client.count_tokens([message])
+            except Exception:
+                # Clients without a tokenizer: roughly four characters per token
+                self._token_counts[key] = len(str(message.content)) // 4 + 4
+        return self._token_counts[key]
+
+    def _compacted(self, message: LLMMessage) -> LLMMessage:
+        if not self.compact_tool_results or not isinstance(message, FunctionExecutionResultMessage):
+            return message
+        return FunctionExecutionResultMessage(content=[
+            FunctionExecutionResult(content=compact_tool_result(r.content), name=r.name,
+                                    call_id=r.call_id, is_error=r.is_error)
+            for r in message.content
+        ])
+
+    async def get_messages(self) -> List[LLMMessage]:
+        start = self._window_start()
+        current = self._current_turn()
+        view: List[LLMMessage] = []
+        if self.policy == "summary" and self.summary:
+            view.append(SystemMessage(content=f"Summary of the earlier conversation:\n{self.summary}"))
+        for i in range(start, len(self._messages)):
+            message = self._messages[i]
+            view.append(self._compacted(message) if i < current else message)
+        return view
+
+    async def summarize(self) -> bool:
+        """
+        Fold the messages that fell out of the window into the rolling summary.
+        Only the messages not summarized before are sent to the model, so each call
+        costs one small completion. Call it between turns, off the response path.
+        Returns:
+        - True if the summary was updated
+        """
+        if self.policy != "summary":
+            return False
+        first = len(self._messages) - self._unsummarized
+        end = self._window_start()
+        if end <= first:
+            return False
+
+        transcript = "\n".join(
+            f"{getattr(m, 'source', None) or type(m).__name__}: {self._compacted(m).content}"
+            for m in self._messages[first:end]
+        )
+        previous = self.summary or "(none)"
+        result = await self.model_client.create([
+            SystemMessage(content=SUMMARY_PROMPT),
+            UserMessage(content=f"Current summary:\n{previous}\n\nNew messages:\n{transcript}", source="user"),
+        ])
+        if not isinstance(result.content, str):
+            return False
+        self.summary = result.content.strip()
+        self._unsummarized = len(self._messages) - end
+        return True
+
+    async def save_state(self) -> Mapping[str, Any]:
+        state = dict(await super().save_state())
+        state["summary"] = self.summary
+        state["unsummarized"] = self._unsummarized
+        return state
+
+    async def load_state(self, state: Mapping[str, Any]) -> None:
+        await super().load_state(state)
+        self.summary = state.get("summary")
+        # Relative to the newest message, so it stays valid when only a tail was loaded
+        self._unsummarized = min(state.get("unsummarized", len(self._messages)), len(self._messages))
+        self._token_counts.clear()
@@ -0,0 +1,97 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import argparse
+from pathlib import Path
+from dataclasses import asdict
+from typing import Any, Dict, Iterator, List, Optional
+from src.models import MusicSearchQuery
+from src.catalog import MOODS, GENRES
+from src.tools import ScraperPool
+
+logger = logging.getLogger(__name__)
+
+
+def grid_queries(step: int = 25, genres: Optional[List[str]] = None) -> Iterator[MusicSearchQuery]:
+    """Sample the query space: every mood, both sliders every `step` points, and
+    no genre filter plus each single genre."""
+    levels = sorted(set(range(0, 101, step)) | {100})
+    for mood in MOODS:
+        for energy in levels:
+            for happiness in levels:
+                for genre in [None] + list(genres if genres is not None else GENRES):
+                    yield MusicSearchQuery(
+                        mood=mood,
+                        energy_level=energy,
+                        happiness_level=happiness,
+                        genres=[genre] if genre else None,
+                    )
+
+
+async def crawl_catalog(path: Path, step: int = 25, pool_size: int = 4, limit: int = 20,
+                        genres: Optional[List[str]] = None) -> int:
+    """Crawl the query grid with a scraper pool and write the catalog file.
+
+    Args:
+    - path: Output catalog JSON file
+    - step: Slider step of the grid
+    - pool_size: Number of browser pages crawling concurrently
+    - limit: Songs kept per grid query
+    - genres: Genres to sample (default: all)
+    Returns:
+    - Number of catalog rows written
+    """
+    queries = list(grid_queries(step, genres))
+    rows: List[Dict[str, Any]] = []
+    failures = 0
+    pool = await ScraperPool(size=pool_size).start()
+
+    async def crawl(query: MusicSearchQuery) -> None:
+        nonlocal failures
+        try:
+            async with pool.lease() as scraper:
+                songs = await scraper.search(query, limit=limit)
+        except Exception as e:
+            failures += 1
+            logger.warning(f"Failed to crawl {query.model_dump_json()}: {e}")
+            return
+        for song in songs:
+            rows.append({
+                **asdict(song),
+                "mood": query.mood,
+                "energy": query.energy_level,
+                "happiness": query.happiness_level,
+                "genre": query.genres[0] if query.genres else None,
+            })
+
+    try:
+        await asyncio.gather(*(crawl(q) for q in queries))
+    finally:
+        await pool.stop()
+
+    print(f"Crawled {len(queries) - failures}/{len(queries)} queries, {len(rows)} rows")
+    # Write atomically so a running app never loads a half-written catalog
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    tmp_path.write_text(json.dumps({
+        "version": 1,
+        "crawled_at": time.time(),
+        "step": step,
+        "songs": rows,
+    }))
+    os.replace(tmp_path, path)
+    return len(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precrawl MusicByMood into a local song catalog")
+    parser.add_argument("--out", type=Path, default=Path(os.getenv("MUSIC_CATALOG_PATH", "music_catalog.json")))
+    parser.add_argument("--step", type=int, default=25, help="slider step of the grid")
+    parser.add_argument("--pool-size", type=int, default=4, help="concurrent browser pages")
+    parser.add_argument("--limit", type=int, default=20, help="songs kept per grid query")
+    parser.add_argument("--genres", nargs="*", default=None, help="genres to sample (default: all)")
+    args = parser.parse_args()
+
+    asyncio.run(crawl_catalog(args.out, step=args.step, pool_size=args.pool_size,
+                              limit=args.limit, genres=args.genres))
@@ -0,0 +1,83 @@
+import os
+from bisect import bisect_left
+from typing import Dict, Optional, Sequence
+from src.timing import get_timer
+
+# Expose per-stage latency histograms on /metrics
+CHATTUNE_METRICS = os.getenv("CHATTUNE_METRICS", "0") == "1"
+
+# Histogram bucket upper bounds in seconds, from SQLite writes up to full music searches
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_NAME = "chattune_stage_duration_seconds"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class StageHistograms:
+    """Cumulative latency histograms per stage, fed by the stage timer.
+
+    Only bucket counts, sum and count are kept, so memory stays fixed however
+    long the server runs. `render` writes the Prometheus text exposition format.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        """
+        Args:
+        - buckets: Ascending bucket upper bounds in seconds (+Inf is implied)
+        """
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._histograms: Dict[str, _Histogram] = {}
+
+    def observe(self, stage: str, ms: float) -> None:
+        """
+        Add one sample (a `StageTimer` observer)
+        Args:
+        - stage: Stage name
+        - ms: Duration in milliseconds
+        """
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            histogram = self._histograms[stage] = _Histogram(len(self.buckets) + 1)
+        seconds = ms / 1000
+        histogram.counts[bisect_left(self.buckets, seconds)] += 1
+        histogram.sum += seconds
+        histogram.count += 1
+
+    def render(self) -> str:
+        lines = [
+            f"# HELP {METRIC_NAME} Latency of chatTune pipeline stages.",
+            f"# TYPE {METRIC_NAME} histogram",
+        ]
+        for stage, histogram in sorted(self._histograms.items()):
+            cumulative = 0
+            for bound, count in zip([*map(repr, self.buckets), "+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f'{METRIC_NAME}_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'{METRIC_NAME}_sum{{stage="{stage}"}} {histogram.sum!r}')
+            lines.append(f'{METRIC_NAME}_count{{stage="{stage}"}} {histogram.count}')
+        return "\n".join(lines) + "\n"
+
+
+_histograms: Optional[StageHistograms] = None
+
+
+def enable_metrics(buckets: Sequence[float] = DEFAULT_BUCKETS) -> StageHistograms:
+    """Start collecting stage histograms (idempotent); spans become active."""
+    global _histograms
+    if _histograms is None:
+        _histograms = StageHistograms(buckets)
+        get_timer().add_observer(_histograms.observe)
+    return _histograms
+
+
+def get_metrics() -> Optional[StageHistograms]:
+    return _histograms
@@ -59,6 +59,25 @@ class MusicSearchQuery(BaseModel):
         if v is not None and (v < 0 or v > 100):
             raise ValueError(f"Level must be between 0 and 100, got {v}")
         return v
+
+    def normalized(self, granularity: int = 10) -> "MusicSearchQuery":
+        """Canonical form of the query: sorted, de-duplicated genres and slider
+        levels snapped to the nearest multiple of `granularity`."""
+        def bucket(v: Optional[int]) -> Optional[int]:
+            if v is None or granularity <= 1:
+                return v
+            return max(0, min(100, int(v / granularity + 0.5) * granularity))
+
+        return MusicSearchQuery(
+            mood=self.mood,
+            energy_level=bucket(self.energy_level),
+            happiness_level=bucket(self.happiness_level),
+            genres=sorted(set(self.genres)) if self.genres else None,
+        )
+
+    def cache_key(self, granularity: int = 10) -> str:
+        """Stable string key of the normalized query."""
+        return self.normalized(granularity).model_dump_json()
     
     class Config:
         use_enum_values = True  # Use string values instead of enum objects
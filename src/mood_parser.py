@@ -0,0 +1,234 @@
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+from src.models import MusicSearchQuery, MoodEnum, GenreEnum
+
+# Descriptions parsed with at least this confidence skip the mood detector LLM call
+# (a value above 1 always asks the LLM)
+MOOD_PARSER_THRESHOLD = float(os.getenv("MOOD_PARSER_THRESHOLD", "0.75"))
+
+# Cue words per mood; multi-word cues are matched as phrases
+MOOD_LEXICON: Dict[MoodEnum, Tuple[str, ...]] = {
+    MoodEnum.HAPPY: ("happy", "cheerful", "joyful", "joy", "glad", "good mood", "great mood", "feel good",
+                     "feel-good", "celebrate", "celebrating", "sunny", "excited", "uplifting", "positive"),
+    MoodEnum.SAD: ("sad", "down", "depressed", "lonely", "alone", "heartbroken", "heartbreak", "breakup",
+                   "broke up", "crying", "cry", "melancholy", "melancholic", "gloomy", "grieving", "miss",
+                   "missing", "blue", "upset", "unhappy"),
+    MoodEnum.ENERGETIC: ("energetic", "energy", "pumped", "pump", "workout", "workouts", "work out",
+                         "working out", "gym", "run", "running", "hype", "hyped", "party", "partying", "training",
+                         "lift", "lifting", "fired up"),
+    MoodEnum.RELAXED: ("relax", "relaxed", "relaxing", "calm", "chill", "chilled", "stressed", "stress",
+                       "anxious", "anxiety", "sleep", "sleepy", "unwind", "peaceful", "mellow", "soothing",
+                       "tired", "cozy", "lazy"),
+    MoodEnum.FOCUSED: ("focus", "focused", "focusing", "study", "studying", "concentrate", "concentration",
+                       "concentrating", "work", "working", "coding", "code", "reading", "homework", "exam",
+                       "exams", "productive"),
+}
+
+# Workout cues; next to one of them, "work" is the workout and not a job
+WORKOUT_CUES = {"workout", "workouts", "work out", "working out", "gym"}
+
+# Site genres and their common spellings
+GENRE_LEXICON: Dict[GenreEnum, Tuple[str, ...]] = {
+    GenreEnum.POP: ("pop",),
+    GenreEnum.COUNTRY: ("country",),
+    GenreEnum.RNB: ("r&b", "rnb", "r and b", "rhythm and blues"),
+    GenreEnum.ACOUSTIC: ("acoustic",),
+    GenreEnum.ROCK: ("rock",),
+    GenreEnum.CLASSIC_ROCK: ("classic rock",),
+    GenreEnum.JAZZ: ("jazz", "jazzy"),
+    GenreEnum.CLASSICAL: ("classical", "piano", "orchestral"),
+    GenreEnum.HIP_HOP: ("hip hop", "hip-hop", "hiphop"),
+    GenreEnum.RAP: ("rap",),
+    GenreEnum.ELECTRONIC: ("electronic", "edm", "techno", "lofi", "lo-fi"),
+    GenreEnum.DANCE: ("dance", "dancing"),
+    GenreEnum.HARD_ROCK: ("hard rock", "metal"),
+    GenreEnum.GRUNGE: ("grunge",),
+    GenreEnum.ALTERNATIVE: ("alternative", "indie", "alt"),
+    GenreEnum.DANCEHALL: ("dancehall",),
+    GenreEnum.AFROBEAT: ("afrobeat", "afrobeats", "afro"),
+}
+
+# Slider levels (energy, happiness) of each mood
+MOOD_LEVELS: Dict[MoodEnum, Tuple[int, int]] = {
+    MoodEnum.HAPPY: (70, 85),
+    MoodEnum.SAD: (30, 20),
+    MoodEnum.ENERGETIC: (90, 70),
+    MoodEnum.RELAXED: (25, 60),
+    MoodEnum.FOCUSED: (45, 55),
+}
+
+# Words that move the sliders, in points
+ENERGY_WORDS = {"upbeat": 15, "fast": 15, "loud": 15, "intense": 20, "high energy": 20,
+                "slow": -15, "soft": -15, "quiet": -15, "gentle": -15, "low energy": -20}
+HAPPINESS_WORDS = {"bright": 15, "fun": 15, "dark": -20, "moody": -15, "bittersweet": -10}
+# Scale of the distance of the levels from the middle
+INTENSIFIERS = {"very": 1.3, "really": 1.3, "so": 1.2, "super": 1.4, "extremely": 1.5, "totally": 1.3}
+DIMINISHERS = {"bit": 0.6, "slightly": 0.6, "little": 0.6, "somewhat": 0.7, "kinda": 0.7}
+NEGATIONS = {"not", "no", "never", "don't", "dont", "can't", "cant", "cannot", "isn't", "aren't", "without",
+             "nothing"}
+# Words that end the clause a negation applies to, like a comma does
+CONJUNCTIONS = {"but", "and", "or", "yet", "though", "although", "instead"}
+
+# Words of a description that carry no mood (only used to judge coverage)
+_FILLER = {
+    "i", "i'm", "im", "me", "my", "a", "an", "the", "some", "any", "music", "songs", "song", "play", "playlist",
+    "tracks", "track", "something", "for", "to", "and", "or", "with", "while", "feel", "feeling", "am", "want",
+    "need", "give", "please", "can", "could", "you", "listen", "of", "in", "on", "today", "tonight", "now",
+    "right", "like", "kind", "bit", "little", "very", "really", "so", "is", "it", "be", "get", "put", "mood",
+    "vibes", "vibe", "at", "this", "that", "about", "us", "we", "let's", "lets", "just", "more", "find", "recommend",
+}
+_WORD = re.compile(r"[a-z0-9&'\-]+")
+_CLAUSE_BREAK = re.compile(r"[,;:.!?()]")
+
+
+@dataclass
+class MoodParse:
+    """A query read from a description, with how sure the parser is about it."""
+    query: MusicSearchQuery
+    confidence: float
+    matched: List[str] = field(default_factory=list)
+
+
+def _phrases(lexicon: Dict) -> Dict[str, List[Tuple[Tuple[str, ...], object]]]:
+    """(tokens, label) of every cue by first token, longest first so "classic rock" wins over "rock"."""
+    index: Dict[str, List[Tuple[Tuple[str, ...], object]]] = {}
+    for label, cues in lexicon.items():
+        for cue in cues:
+            words = tuple(_WORD.findall(cue))
+            index.setdefault(words[0], []).append((words, label))
+    for entries in index.values():
+        entries.sort(key=lambda e: -len(e[0]))
+    return index
+
+
+_MOOD_PHRASES = _phrases(MOOD_LEXICON)
+_GENRE_PHRASES = _phrases(GENRE_LEXICON)
+# Keyed by word: several words share a delta
+_ENERGY_PHRASES = _phrases({word: (word,) for word in ENERGY_WORDS})
+_HAPPINESS_PHRASES = _phrases({word: (word,) for word in HAPPINESS_WORDS})
+
+
+def _match(tokens: List[str], phrases: Dict[str, List[Tuple[Tuple[str, ...], object]]],
+           used: List[bool]) -> List[Tuple[int, object, str]]:
+    """(position, label, cue) of each phrase found in tokens not already claimed by another cue."""
+    found = []
+    for i, token in enumerate(tokens):
+        for cue, label in phrases.get(token, ()):
+            n = len(cue)
+            if tuple(tokens[i:i + n]) == cue and not any(used[i:i + n]):
+                used[i:i + n] = [True] * n
+                found.append((i, label, " ".join(cue)))
+                break
+    return found
+
+
+def _tokenize(description: str) -> Tuple[List[str], List[int]]:
+    """Words of a description and, for each, the position of the first word of its clause."""
+    tokens: List[str] = []
+    clauses: List[int] = []
+    end = 0
+    for word in _WORD.finditer(description.lower()):
+        if not tokens or _CLAUSE_BREAK.search(description, end, word.start()) or word.group() in CONJUNCTIONS:
+            start = len(tokens)
+        tokens.append(word.group())
+        clauses.append(start)
+        end = word.end()
+    return tokens, clauses
+
+
+def _negated(tokens: List[str], clauses: List[int], position: int) -> bool:
+    # "not in the mood for jazz, something happy" negates jazz, not happy
+    return any(t in NEGATIONS for t in tokens[clauses[position]:position])
+
+
+def _scale(tokens: List[str], position: int) -> float:
+    scale = 1.0
+    for t in tokens[max(0, position - 2):position]:
+        scale *= INTENSIFIERS.get(t, 1.0) * DIMINISHERS.get(t, 1.0)
+    return scale
+
+
+def _level(value: float) -> int:
+    return max(0, min(100, int(round(value))))
+
+
+def parse_mood(description: str) -> MoodParse:
+    """
+    Read mood, genres and slider levels from a description without a model call
+    Args:
+    - description: The user's description, e.g. "calm jazz for studying"
+    Returns:
+    - parse: Query and confidence in [0, 1]; 0 when nothing was recognized
+    """
+    tokens, clauses = _tokenize(description)
+    used = [False] * len(tokens)
+    # Genres and slider phrases first: "dance" is a genre and "low energy" a level before they are moods
+    genre_cues = _match(tokens, _GENRE_PHRASES, used)
+    energy_cues = _match(tokens, _ENERGY_PHRASES, used)
+    happiness_cues = _match(tokens, _HAPPINESS_PHRASES, used)
+    moods = _match(tokens, _MOOD_PHRASES, used)
+    if any(cue in WORKOUT_CUES for _, _, cue in moods):
+        moods = [(i, m, cue) for i, m, cue in moods if cue not in ("work", "working")]
+
+    genres = [(i, g, cue) for i, g, cue in genre_cues if not _negated(tokens, clauses, i)]
+    negations = len(genre_cues) - len(genres)
+    scores: Dict[MoodEnum, float] = {}
+    for i, mood, _ in moods:
+        if _negated(tokens, clauses, i):
+            negations += 1
+            continue
+        scores[mood] = scores.get(mood, 0.0) + _scale(tokens, i)
+
+    genre_list = sorted({g for _, g, _ in genres}, key=list(GenreEnum).index)
+    matched = [cue for _, _, cue in sorted(genre_cues + energy_cues + happiness_cues + moods, key=lambda c: c[0])]
+    if not scores and not genre_list:
+        return MoodParse(MusicSearchQuery(), 0.0, matched)
+
+    mood: Optional[MoodEnum] = None
+    energy = happiness = None
+    if scores:
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+        mood, top = ranked[0]
+        second = ranked[1][1] if len(ranked) > 1 else 0.0
+        # Distance from the middle, stretched by intensifiers of the winning cue
+        scale = max(_scale(tokens, i) for i, m, _ in moods if m == mood and not _negated(tokens, clauses, i))
+        base_energy, base_happiness = MOOD_LEVELS[mood]
+        energy = 50 + (base_energy - 50) * scale
+        happiness = 50 + (base_happiness - 50) * scale
+        # A clear winner is trusted; a tie between moods is not
+        mood_confidence = (top - second) / top
+        confidence = 0.6 + 0.3 * mood_confidence + (0.1 if genre_list else 0.0)
+    else:
+        # Genres alone ("play some jazz") make a complete query without sliders
+        confidence = 0.8
+
+    # Level words pulling a slider against the mood ("down ... upbeat") are mixed signals
+    mood_energy, mood_happiness = MOOD_LEVELS[mood] if mood is not None else (50, 50)
+    conflicts = 0
+    for _, word, _ in energy_cues:
+        delta = ENERGY_WORDS[word]
+        conflicts += delta * (mood_energy - 50) < 0
+        energy = (energy if energy is not None else 50) + delta
+    for _, word, _ in happiness_cues:
+        delta = HAPPINESS_WORDS[word]
+        conflicts += delta * (mood_happiness - 50) < 0
+        happiness = (happiness if happiness is not None else 50) + delta
+
+    # Negations, mixed signals and words the lexicon does not know hint at nuance the
+    # LLM reads better
+    if negations or conflicts:
+        confidence *= 0.7
+    unknown = [t for t, u in zip(tokens, used) if not u and t not in _FILLER and t not in NEGATIONS
+               and t not in INTENSIFIERS and t not in DIMINISHERS]
+    if tokens:
+        confidence *= 1.0 - 0.5 * len(unknown) / len(tokens)
+
+    query = MusicSearchQuery(
+        mood=mood,
+        energy_level=_level(energy) if energy is not None else None,
+        happiness_level=_level(happiness) if happiness is not None else None,
+        genres=genre_list or None,
+    )
+    return MoodParse(query, round(confidence, 3), matched)
@@ -0,0 +1,128 @@
+import time
+import asyncio
+import logging
+from typing import Any, Optional
+from src.storage import ChatHistoryLog, ChatStateStore
+from src.timing import span
+
+logger = logging.getLogger(__name__)
+
+
+class PersistenceWorker:
+    """Write-behind queue for chat state saves and history appends.
+
+    Chat turns enqueue their writes and reply to the client without waiting for
+    SQLite. A background task drains the queue in batches: several pending state
+    saves of one session collapse into the newest one, and each batch is written in
+    one transaction per store. `stop` drains whatever is still queued.
+    """
+
+    def __init__(self, state_store: ChatStateStore, history_log: ChatHistoryLog, max_batch: int = 256) -> None:
+        """
+        Args:
+        - state_store: Store receiving agent state saves
+        - history_log: Log receiving history appends
+        - max_batch: Maximum number of queued writes flushed together
+        """
+        self.state_store = state_store
+        self.history_log = history_log
+        self.max_batch = max_batch
+        # Items are ("state", session_id, state) or ("history", session_id, entries)
+        self._queue: "asyncio.Queue[tuple[str, str, Any]]" = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.flushes = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def start(self) -> "PersistenceWorker":
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        return self
+
+    async def stop(self) -> None:
+        """Flush everything queued so far, then stop the worker."""
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def save_state(self, session_id: str, state: dict[str, Any]) -> None:
+        """
+        Queue a save of a session's agent state
+        Args:
+        - session_id: Session key
+        - state: Agent state from `save_state()`; it must not be mutated afterwards
+        """
+        self._queue.put_nowait(("state", session_id, state))
+
+    def append_history(self, session_id: str, entries: list[dict[str, Any]]) -> None:
+        """
+        Queue entries to append to a session's history
+        Args:
+        - session_id: Session key
+        - entries: Messages with `content` and `source`
+        """
+        self._queue.put_nowait(("history", session_id, entries))
+
+    async def join(self) -> None:
+        """Wait until every write queued so far is on disk (read-your-writes)."""
+        await self._queue.join()
+
+    async def _run(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            try:
+                await self._flush(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _flush(self, batch: list[tuple[str, str, Any]]) -> None:
+        states: dict[str, dict[str, Any]] = {}
+        history: list[tuple[str, list[dict[str, Any]]]] = []
+        for kind, session_id, payload in batch:
+            if kind == "state":
+                if session_id in states:
+                    self.coalesced += 1
+                states[session_id] = payload
+            else:
+                history.append((session_id, payload))
+
+        start = time.perf_counter()
+        try:
+            if states:
+                with span("state_save"):
+                    await self.state_store.save_states(states)
+            if history:
+                with span("history_append"):
+                    await self.history_log.append_many(history)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Failed to persist {len(batch)} chat writes: {e}")
+            return
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.flushes += 1
+        self.writes += len(batch)
+        self.last_flush_ms = elapsed_ms
+        self.max_flush_ms = max(self.max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "flushes": self.flushes,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "last_flush_ms": self.last_flush_ms,
+            "avg_flush_ms": self._total_flush_ms / self.flushes if self.flushes else 0.0,
+            "max_flush_ms": self.max_flush_ms,
+        }
@@ -0,0 +1,96 @@
+from contextlib import asynccontextmanager
+from contextvars import ContextVar, Token
+from typing import Any, AsyncIterator, Awaitable, Callable, List, Optional
+
+# Receives progress events, e.g. by sending them over the active WebSocket
+ProgressSink = Callable[[dict[str, Any]], Awaitable[None]]
+
+# Set per chat connection; tasks started while handling a turn (agent tool calls,
+# the music team runtime) inherit it
+_progress_sink: ContextVar[Optional[ProgressSink]] = ContextVar("progress_sink", default=None)
+
+
+def set_progress_sink(sink: Optional[ProgressSink]) -> Token:
+    """
+    Route progress events of the current context to `sink`
+    Args:
+    - sink: Async callable receiving each event dict
+    Returns:
+    - token: Pass to `reset_progress_sink` to restore the previous sink
+    """
+    return _progress_sink.set(sink)
+
+
+def reset_progress_sink(token: Token) -> None:
+    _progress_sink.reset(token)
+
+
+async def report_progress(stage: str, message: str, **data: Any) -> None:
+    """
+    Publish a progress event to the current sink, if any
+    Args:
+    - stage: Machine-readable stage, e.g. "mood_detected", "searching", "song"
+    - message: Human-readable status line
+    - data: Extra JSON-serializable fields
+    """
+    sink = _progress_sink.get()
+    if sink is None:
+        return
+    await _send(sink, {"type": "progress", "stage": stage, "message": message, **data})
+
+
+async def _send(sink: ProgressSink, event: dict[str, Any]) -> None:
+    try:
+        await sink(event)
+    except Exception:
+        # Progress is best effort; a closed connection must not fail the search
+        pass
+
+
+class ProgressFanout:
+    """Progress of work shared by several callers, e.g. one coalesced music search.
+
+    The shared task runs in the context of whichever caller started it, so it
+    reports through `report` instead of `report_progress`. Every caller subscribes
+    its own sink for as long as it waits; late subscribers first receive the events
+    reported so far, and a caller that leaves (e.g. its socket closed) stops
+    receiving without affecting the others.
+    """
+
+    def __init__(self) -> None:
+        self._sinks: List[ProgressSink] = []
+        self._events: List[dict[str, Any]] = []
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._sinks)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator["ProgressFanout"]:
+        """Relay the events to the current context's sink while the block runs."""
+        sink = _progress_sink.get()
+        if sink is not None:
+            # Catch up in order; events reported meanwhile are replayed too
+            sent = 0
+            while sent < len(self._events):
+                await _send(sink, self._events[sent])
+                sent += 1
+            self._sinks.append(sink)
+        try:
+            yield self
+        finally:
+            if sink is not None:
+                self._sinks.remove(sink)
+
+    async def report(self, stage: str, message: str, **data: Any) -> None:
+        """
+        Publish a progress event to every subscriber
+        Args:
+        - stage: Machine-readable stage
+        - message: Human-readable status line
+        - data: Extra JSON-serializable fields
+        """
+        event = {"type": "progress", "stage": stage, "message": message, **data}
+        self._events.append(event)
+        for sink in list(self._sinks):
+            await _send(sink, event)
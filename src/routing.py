@@ -0,0 +1,172 @@
+import re
+import json
+import asyncio
+import hashlib
+import logging
+from pathlib import Path
+from urllib.parse import urlparse
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set, Tuple
+from playwright.async_api import BrowserContext, Request, Response, Route
+
+logger = logging.getLogger(__name__)
+
+# Resource types the scraper never needs
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+# Analytics and ad hosts (matched as domain suffixes)
+TRACKER_HOSTS = (
+    "google-analytics.com",
+    "googletagmanager.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "facebook.net",
+    "hotjar.com",
+    "clarity.ms",
+    "segment.io",
+    "plausible.io",
+    "vercel-insights.com",
+)
+# Resource types served from the static asset cache
+STATIC_RESOURCE_TYPES = {"script", "stylesheet"}
+# Response headers kept with a cached asset (bodies are stored decoded)
+_KEPT_HEADERS = ("content-type", "cache-control", "etag", "last-modified")
+# Content-hashed bundle names such as main.3f2a9c1b.js or /_next/static/...
+_HASHED_ASSET = re.compile(r"(/_next/static/|[.-][0-9a-f]{8,}\.(js|css)$)")
+
+
+@dataclass
+class NavigationStats:
+    requests: int = 0
+    blocked: int = 0
+    cache_hits: int = 0
+    revalidated: int = 0
+    network: int = 0
+    network_bytes: int = 0
+    cached_bytes: int = 0
+
+
+def _is_tracker(url: str) -> bool:
+    host = urlparse(url).hostname or ""
+    return any(host == t or host.endswith("." + t) for t in TRACKER_HOSTS)
+
+
+def _is_immutable(url: str, headers: Dict[str, str]) -> bool:
+    return "immutable" in headers.get("cache-control", "") or bool(_HASHED_ASSET.search(urlparse(url).path))
+
+
+class StaticAssetCache:
+    """On-disk cache of the site's JS/CSS bundles.
+
+    Immutable (content-hashed) assets are served straight from disk; others are
+    revalidated with If-None-Match / If-Modified-Since and served from disk on 304.
+    """
+
+    def __init__(self, directory: Path = Path(".static_cache")) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        digest = hashlib.sha256(url.encode()).hexdigest()
+        return self.directory / f"{digest}.body", self.directory / f"{digest}.json"
+
+    def get(self, url: str) -> Optional[Tuple[Dict[str, Any], bytes]]:
+        body_path, meta_path = self._paths(url)
+        try:
+            return json.loads(meta_path.read_text()), body_path.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, headers: Dict[str, str], body: bytes) -> None:
+        body_path, meta_path = self._paths(url)
+        meta = {
+            "url": url,
+            "headers": {k: headers[k] for k in _KEPT_HEADERS if k in headers},
+            "immutable": _is_immutable(url, headers),
+        }
+        # Body first, metadata last: an entry is only visible once both exist
+        body_path.write_bytes(body)
+        meta_path.write_text(json.dumps(meta))
+
+
+class ResourceRouter:
+    """Routes every request of a browser context.
+
+    Heavy resources and trackers are aborted, static bundles go through the
+    StaticAssetCache, and everything else continues to the network. Counters are
+    collected in `stats` until the next `reset`.
+    """
+
+    def __init__(self, cache: Optional[StaticAssetCache] = None,
+                 blocked_types: Set[str] = BLOCKED_RESOURCE_TYPES) -> None:
+        self.cache = cache
+        self.blocked_types = blocked_types
+        self.stats = NavigationStats()
+        # Requests continued to the network, whose size is read from their response
+        self._passthrough: Set[Request] = set()
+
+    async def install(self, context: BrowserContext) -> None:
+        await context.route("**/*", self.handle)
+        context.on("response", self._on_response)
+
+    def reset(self) -> NavigationStats:
+        """Start a new counting window and return the previous one."""
+        stats, self.stats = self.stats, NavigationStats()
+        self._passthrough.clear()
+        return stats
+
+    def _on_response(self, response: Response) -> None:
+        request = response.request
+        if request in self._passthrough:
+            self._passthrough.discard(request)
+            self.stats.network_bytes += int(response.headers.get("content-length") or 0)
+
+    async def handle(self, route: Route) -> None:
+        request = route.request
+        self.stats.requests += 1
+        if request.resource_type in self.blocked_types or _is_tracker(request.url):
+            self.stats.blocked += 1
+            await route.abort()
+            return
+        if self.cache is not None and request.method == "GET" and request.resource_type in STATIC_RESOURCE_TYPES:
+            try:
+                await self._serve_static(route)
+                return
+            except Exception as e:
+                logger.warning(f"Static cache failed for {request.url}: {e}")
+        self.stats.network += 1
+        self._passthrough.add(request)
+        await route.continue_()
+
+    async def _serve_static(self, route: Route) -> None:
+        assert self.cache
+        url = route.request.url
+        cached = await asyncio.to_thread(self.cache.get, url)
+        if cached is not None:
+            meta, body = cached
+            if meta["immutable"]:
+                self.stats.cache_hits += 1
+                self.stats.cached_bytes += len(body)
+                await route.fulfill(status=200, headers=meta["headers"], body=body)
+                return
+
+        headers = dict(route.request.headers)
+        if cached is not None:
+            if "etag" in meta["headers"]:
+                headers["if-none-match"] = meta["headers"]["etag"]
+            if "last-modified" in meta["headers"]:
+                headers["if-modified-since"] = meta["headers"]["last-modified"]
+        response = await route.fetch(headers=headers)
+        if response.status == 304 and cached is not None:
+            self.stats.revalidated += 1
+            self.stats.cached_bytes += len(body)
+            await route.fulfill(status=200, headers=meta["headers"], body=body)
+            return
+
+        fresh = await response.body()
+        self.stats.network += 1
+        self.stats.network_bytes += len(fresh)
+        if response.status == 200:
+            await asyncio.to_thread(self.cache.put, url, response.headers, fresh)
+        # The body is decoded, so drop the original encoding and length headers
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-encoding", "content-length")}
+        await route.fulfill(status=response.status, headers=headers, body=fresh)
@@ -0,0 +1,236 @@
+import json
+import time
+import sqlite3
+import asyncio
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+# PRAGMA synchronous levels: how often SQLite fsyncs. With WAL, NORMAL never corrupts
+# the database but may lose the last transactions on power loss; FULL does not.
+SYNCHRONOUS_LEVELS = ("OFF", "NORMAL", "FULL")
+
+
+def _connect(path: Path, synchronous: str) -> sqlite3.Connection:
+    if synchronous.upper() not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"synchronous must be one of {SYNCHRONOUS_LEVELS}, got {synchronous!r}")
+    db = sqlite3.connect(str(path), check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute(f"PRAGMA synchronous={synchronous.upper()}")
+    return db
+
+
+class ChatStateStore:
+    """SQLite store of chat agent state, keyed by session.
+
+    The agent's model context messages are stored one row each, so a save only
+    appends the messages added since the previous save, and a load reads just the
+    newest `max_messages` rows. The rest of the state is stored as one small JSON
+    document per session.
+    """
+
+    def __init__(self, path: Path = Path("chat_state.sqlite3"), synchronous: str = "NORMAL") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = _connect(path, synchronous)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS agent_state ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS agent_messages ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, message TEXT NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._db.commit()
+        # Per session: (seq of the first in-memory message, number of them already stored)
+        self._cursors: dict[str, tuple[int, int]] = {}
+
+    @staticmethod
+    def _split(state: dict[str, Any]) -> tuple[dict[str, Any], list[Any]]:
+        """Separate the model context messages from the rest of the state."""
+        llm_context = dict(state.get("llm_context") or {})
+        messages = llm_context.pop("messages", [])
+        return {**state, "llm_context": llm_context}, messages
+
+    def _load(self, session_id: str, max_messages: Optional[int]) -> Optional[dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state FROM agent_state WHERE session_id = ?", (session_id,)
+            ).fetchone()
+            rows = self._db.execute(
+                "SELECT seq, message FROM agent_messages WHERE session_id = ? ORDER BY seq DESC LIMIT ?",
+                (session_id, max_messages if max_messages is not None else -1),
+            ).fetchall()
+        rows.reverse()
+        messages = [json.loads(message) for _, message in rows]
+        # A truncated tail must not start mid-turn (e.g. with an orphaned tool result)
+        if max_messages is not None:
+            while messages and messages[0].get("type") != "UserMessage":
+                messages.pop(0)
+                rows.pop(0)
+
+        next_seq = self._next_seq(session_id)
+        base_seq = rows[0][0] if rows else next_seq
+        self._cursors[session_id] = (base_seq, len(messages))
+        if row is None:
+            return None
+        state = json.loads(row[0])
+        state["llm_context"] = {**(state.get("llm_context") or {}), "messages": messages}
+        return state
+
+    def _next_seq(self, session_id: str) -> int:
+        with self._lock:
+            (max_seq,) = self._db.execute(
+                "SELECT MAX(seq) FROM agent_messages WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        return 0 if max_seq is None else max_seq + 1
+
+    def _write(self, session_id: str, state: dict[str, Any], cursor: tuple[int, int]) -> int:
+        shell, messages = self._split(state)
+        base_seq, stored = cursor
+        if len(messages) < stored:
+            # The context shrank: rewrite the in-memory window
+            self._db.execute(
+                "DELETE FROM agent_messages WHERE session_id = ? AND seq >= ?", (session_id, base_seq)
+            )
+            stored = 0
+        new_messages = messages[stored:]
+        self._db.executemany(
+            "INSERT OR REPLACE INTO agent_messages (session_id, seq, message) VALUES (?, ?, ?)",
+            [(session_id, base_seq + stored + i, json.dumps(m, default=str)) for i, m in enumerate(new_messages)],
+        )
+        self._db.execute(
+            "INSERT OR REPLACE INTO agent_state (session_id, state) VALUES (?, ?)",
+            (session_id, json.dumps(shell, default=str)),
+        )
+        self._cursors[session_id] = (base_seq, len(messages))
+        return len(new_messages)
+
+    def _save_many(self, states: dict[str, dict[str, Any]]) -> int:
+        cursors = {
+            session_id: self._cursors.get(session_id) or (self._next_seq(session_id), 0)
+            for session_id in states
+        }
+        # One transaction (and at most one fsync) for the whole batch
+        with self._lock:
+            written = sum(self._write(session_id, state, cursors[session_id])
+                          for session_id, state in states.items())
+            self._db.commit()
+        return written
+
+    def _save(self, session_id: str, state: dict[str, Any]) -> int:
+        return self._save_many({session_id: state})
+
+    async def load_state(self, session_id: str, max_messages: Optional[int] = None) -> Optional[dict[str, Any]]:
+        """
+        Load the agent state of a session
+        Args:
+        - session_id: Session key
+        - max_messages: Only load this many of the newest messages (None loads all)
+        Returns:
+        - state: Agent state, or None for a new session
+        """
+        return await asyncio.to_thread(self._load, session_id, max_messages)
+
+    async def save_state(self, session_id: str, state: dict[str, Any]) -> int:
+        """
+        Save the agent state of a session, appending only new messages
+        Args:
+        - session_id: Session key
+        - state: Agent state from `save_state()`
+        Returns:
+        - Number of message rows written
+        """
+        return await asyncio.to_thread(self._save, session_id, state)
+
+    async def save_states(self, states: dict[str, dict[str, Any]]) -> int:
+        """
+        Save the agent states of several sessions in one transaction
+        Args:
+        - states: Agent state by session key
+        Returns:
+        - Number of message rows written
+        """
+        return await asyncio.to_thread(self._save_many, states)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
+
+
+class ChatHistoryLog:
+    """Append-only SQLite log of the chat transcript shown in the UI, keyed by session.
+
+    Appends are single inserts and pages are read newest-first with a `before` id
+    cursor, so neither cost grows with the length of the conversation.
+    """
+
+    def __init__(self, path: Path = Path("chat_state.sqlite3"), synchronous: str = "NORMAL") -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = _connect(path, synchronous)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chat_history ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+            "source TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS chat_history_session ON chat_history (session_id, id)"
+        )
+        self._db.commit()
+
+    def _append_many(self, batch: list[tuple[str, list[dict[str, Any]]]]) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.executemany(
+                "INSERT INTO chat_history (session_id, source, content, created_at) VALUES (?, ?, ?, ?)",
+                [(session_id, e["source"], str(e["content"]), now) for session_id, entries in batch for e in entries],
+            )
+            self._db.commit()
+
+    def _append(self, session_id: str, entries: list[dict[str, Any]]) -> None:
+        self._append_many([(session_id, entries)])
+
+    def _page(self, session_id: str, limit: int, before: Optional[int]) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, source, content FROM chat_history "
+                "WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                (session_id, before if before is not None else 2 ** 63 - 1, limit),
+            ).fetchall()
+        rows.reverse()
+        return [{"id": id_, "source": source, "content": content} for id_, source, content in rows]
+
+    async def append(self, session_id: str, entries: list[dict[str, Any]]) -> None:
+        """
+        Append entries to the history of a session
+        Args:
+        - session_id: Session key
+        - entries: Messages with `content` and `source`
+        """
+        await asyncio.to_thread(self._append, session_id, entries)
+
+    async def append_many(self, batch: list[tuple[str, list[dict[str, Any]]]]) -> None:
+        """
+        Append to the histories of several sessions in one transaction
+        Args:
+        - batch: (session key, entries) pairs, appended in order
+        """
+        await asyncio.to_thread(self._append_many, batch)
+
+    async def page(self, session_id: str, limit: int = 50, before: Optional[int] = None) -> list[dict[str, Any]]:
+        """
+        Get a page of history, oldest first
+        Args:
+        - session_id: Session key
+        - limit: Maximum number of messages
+        - before: Only return messages with an id lower than this cursor (None for the newest page)
+        Returns:
+        - history: list of chat messages with their `id`
+        """
+        return await asyncio.to_thread(self._page, session_id, limit, before)
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
@@ -3,24 +3,128 @@ from dotenv import load_dotenv
 load_dotenv()
 
 import json
+import yaml
 import asyncio
+from pathlib import Path
+from contextlib import asynccontextmanager
+from typing import Annotated, Any, Dict, List, Optional
+from autogen_core import CancellationToken
+from autogen_core.tools import FunctionTool
+from autogen_core.models import ChatCompletionClient, SystemMessage, UserMessage
+from autogen_ext.models.cache import ChatCompletionCache
 from autogen_agentchat.ui import Console
 from autogen_agentchat.agents import AssistantAgent
 from autogen_agentchat.teams import RoundRobinGroupChat
 from autogen_ext.models.openai import OpenAIChatCompletionClient
 from autogen_agentchat.conditions import MaxMessageTermination, TextMentionTermination
 from src.models import MusicSearchQuery
-from src.tools import search_music_by_mood
+from src.tools import encode_songs, search_music_by_mood
+from src.cache import LLMResponseStore
+from src.timing import TimedChatCompletionClient, get_timer
 
-async def get_music_team()->RoundRobinGroupChat:
+# Model of the music team agents, or a component config yaml (same format as
+# model_config.yaml) that replaces the OpenAI client, e.g. for benchmarks
+MUSIC_TEAM_MODEL = os.getenv("MUSIC_TEAM_MODEL", "gpt-4o-mini")
+MUSIC_TEAM_MODEL_CONFIG = os.getenv("MUSIC_TEAM_MODEL_CONFIG")
 
-    mood_detector = AssistantAgent(
-        name="mood_detector",
-        model_client=OpenAIChatCompletionClient(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY"),
-        ),
-        system_message=f"""
+# "fast": one structured-output call for the query, then a direct search and fixed
+# formatting; "team": the mood_detector -> music_retriever -> approver group chat.
+# The fast mode falls back to the team when the query cannot be produced.
+MUSIC_PIPELINE_MODE = os.getenv("MUSIC_PIPELINE_MODE", "fast")
+
+# LLM response cache: agents whose completions are cached (comma-separated, empty disables)
+MUSIC_LLM_CACHE_AGENTS = {a.strip() for a in os.getenv("MUSIC_LLM_CACHE_AGENTS", "mood_detector,music_retriever,approver").split(",") if a.strip()}
+MUSIC_LLM_CACHE_PATH = os.getenv("MUSIC_LLM_CACHE_PATH", "llm_cache.sqlite3")
+MUSIC_LLM_CACHE_TTL = float(os.getenv("MUSIC_LLM_CACHE_TTL", str(7 * 24 * 3600)))
+MUSIC_LLM_CACHE_SIZE = int(os.getenv("MUSIC_LLM_CACHE_SIZE", "10000"))
+
+# Number of idle music teams kept for reuse; busier moments build extra ones
+MUSIC_TEAM_POOL_SIZE = int(os.getenv("MUSIC_TEAM_POOL_SIZE", "2"))
+
+# One cache store per agent and model, shared by every team
+_llm_cache_stores: Dict[str, LLMResponseStore] = {}
+# Model client shared by all agents, and its per-agent (cached) wrappers
+_team_model_client: Optional[ChatCompletionClient] = None
+# Model the shared client actually talks to; part of the LLM cache namespace
+_team_model_name = MUSIC_TEAM_MODEL
+_agent_model_clients: Dict[str, ChatCompletionClient] = {}
+
+def get_llm_cache_stats() -> Dict[str, Any]:
+    """Hit-rate counters of the LLM response cache, per agent and model."""
+    return {namespace: store.stats() for namespace, store in _llm_cache_stores.items()}
+
+def get_team_model_client() -> ChatCompletionClient:
+    """
+    Model client shared by every music team agent and run, created on first use so
+    its keep-alive connection pool is reused across searches
+    Returns:
+    - model_client: ChatCompletionClient
+    """
+    global _team_model_client, _team_model_name
+    if _team_model_client is None:
+        if MUSIC_TEAM_MODEL_CONFIG:
+            with open(MUSIC_TEAM_MODEL_CONFIG) as f:
+                model_config = yaml.safe_load(f)
+            model_client = ChatCompletionClient.load_component(model_config)
+            # Provider and model of the config, so switching either misses the old cache entries
+            model = (model_config.get("config") or {}).get("model") or MUSIC_TEAM_MODEL_CONFIG
+            _team_model_name = f"{model_config.get('provider')}:{model}"
+        else:
+            _team_model_name = MUSIC_TEAM_MODEL
+            model_client = OpenAIChatCompletionClient(
+                model=MUSIC_TEAM_MODEL,
+                api_key=os.getenv("OPENAI_API_KEY"),
+            )
+        if get_timer().active:
+            model_client = TimedChatCompletionClient(model_client, stage="team_llm")
+        _team_model_client = model_client
+    return _team_model_client
+
+def get_agent_model_client(agent_name: str) -> ChatCompletionClient:
+    """
+    Model client of a music team agent: the shared client, wrapped in the response
+    cache if enabled for the agent
+    Args:
+    - agent_name: Name of the agent
+    Returns:
+    - model_client: ChatCompletionClient
+    """
+    model_client = _agent_model_clients.get(agent_name)
+    if model_client is not None:
+        return model_client
+    model_client = get_team_model_client()
+    if agent_name in MUSIC_LLM_CACHE_AGENTS:
+        namespace = f"{agent_name}:{_team_model_name}"
+        store = _llm_cache_stores.get(namespace)
+        if store is None:
+            store = _llm_cache_stores[namespace] = LLMResponseStore(Path(MUSIC_LLM_CACHE_PATH),
+                                                                    namespace=namespace,
+                                                                    ttl_seconds=MUSIC_LLM_CACHE_TTL,
+                                                                    max_entries=MUSIC_LLM_CACHE_SIZE)
+        model_client = ChatCompletionCache(model_client, store)
+    _agent_model_clients[agent_name] = model_client
+    return model_client
+
+async def close_team_model_client() -> None:
+    """
+    Close the shared model client and the LLM cache stores (at app shutdown), and
+    drop the pooled teams built on them so the next use starts afresh
+    """
+    global _team_model_client, _team_model_name, _music_team_pool
+    _music_team_pool = None
+    _agent_model_clients.clear()
+    stores = list(_llm_cache_stores.values())
+    _llm_cache_stores.clear()
+    for store in stores:
+        await store.flush()
+        store.close()
+    _team_model_name = MUSIC_TEAM_MODEL
+    if _team_model_client is not None:
+        client, _team_model_client = _team_model_client, None
+        await client.close()
+
+# Shared by the team's mood_detector and the fast pipeline
+MOOD_DETECTOR_PROMPT = f"""
         You are a mood detector.
         Your job is to detect the mood of the user 
         base on user's message or conversation history.
@@ -28,14 +132,64 @@ async def get_music_team()->RoundRobinGroupChat:
         {json.dumps(MusicSearchQuery.model_json_schema(), indent=2)}
         ONLY RETURN THE QUERY STRUCTURE. DO NOT RETURN ANYTHING ELSE.
         """
+
+async def detect_music_query(description: str,
+                             cancellation_token: Optional[CancellationToken] = None) -> MusicSearchQuery:
+    """
+    Turn the user's description into a search query with one structured-output call
+    Args:
+    - description: The user's description of the music they want
+    - cancellation_token: Cancels the model call
+    Returns:
+    - query: MusicSearchQuery (raises if the reply does not validate)
+    """
+    model_client = get_agent_model_client("mood_detector")
+    result = await model_client.create(
+        [SystemMessage(content=MOOD_DETECTOR_PROMPT), UserMessage(content=description, source="user")],
+        json_output=MusicSearchQuery,
+        cancellation_token=cancellation_token,
+    )
+    if not isinstance(result.content, str):
+        raise ValueError(f"Expected a JSON query, got {type(result.content).__name__}")
+    return MusicSearchQuery.model_validate_json(result.content)
+
+async def search_music_for_team(mood: Annotated[Optional[str], "Happy, Sad, Energetic, Relaxed or Focused"] = None,
+                                energy_level: Annotated[Optional[int], "0 (Calm) to 100 (Energetic)"] = None,
+                                happiness_level: Annotated[Optional[int], "0 (Melancholic) to 100 (Joyful)"] = None,
+                                genres: Annotated[Optional[List[str]], "Music genres to filter by"] = None,
+                                cancellation_token: Optional[CancellationToken] = None) -> str:
+    """
+    Search songs and return them in the compact line format of `encode_songs`
+    Args:
+    - mood: The mood (e.g., "Happy", "Sad", "Energetic", "Relaxed", "Focused")
+    - energy_level: Energy level from 0 (Calm) to 100 (Energetic)
+    - happiness_level: Happiness level from 0 (Melancholic) to 100 (Joyful)
+    - genres: List of music genres to filter by
+    - cancellation_token: Cancels the search (injected by the agent)
+    Returns:
+    - songs: "N. Title - Artist (genres; duration)" lines, at most MUSIC_TOOL_TOP_K
+    """
+    songs = await search_music_by_mood(mood=mood, energy_level=energy_level, happiness_level=happiness_level,
+                                       genres=genres, cancellation_token=cancellation_token)
+    return encode_songs(songs)
+
+# The retriever's tool keeps the search_music_by_mood name the prompts use, but its
+# result enters the conversation as compact lines instead of Song reprs
+search_music_tool = FunctionTool(search_music_for_team,
+                                 name="search_music_by_mood",
+                                 description="Search songs on MusicByMood by mood, energy, happiness and genres.")
+
+async def get_music_team()->RoundRobinGroupChat:
+
+    mood_detector = AssistantAgent(
+        name="mood_detector",
+        model_client=get_agent_model_client("mood_detector"),
+        system_message=MOOD_DETECTOR_PROMPT
     )
 
     music_retriever = AssistantAgent(
         name="music_retriever",
-        model_client=OpenAIChatCompletionClient(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY"),
-        ),
+        model_client=get_agent_model_client("music_retriever"),
         system_message=f"""
         You are a music retriever.
         Your job is to retrieve music based on the JSON query structure provided by the mood_detector.
@@ -55,15 +209,12 @@ async def get_music_team()->RoundRobinGroupChat:
         
         Always pass all available fields from the JSON, even if they are null.
         """,
-        tools=[search_music_by_mood]
+        tools=[search_music_tool]
     )
 
     approver = AssistantAgent(
         name="approver",
-        model_client=OpenAIChatCompletionClient(
-            model="gpt-4o-mini",
-            api_key=os.getenv("OPENAI_API_KEY"),
-        ),
+        model_client=get_agent_model_client("approver"),
         system_message="""
         You are an approver.
         Your job is to approve the music retrieved by the music_retriever.
@@ -86,6 +237,62 @@ async def get_music_team()->RoundRobinGroupChat:
                         termination_condition=termination_condition)
     return team
 
+class MusicTeamPool:
+    """Idle music teams reused across searches.
+
+    A team can only run one task at a time, so each search leases its own team
+    and the team is reset before it goes back to the pool. When every pooled team
+    is busy a new one is built (cheap, since the agents share one model client);
+    at most `size` idle teams are kept.
+    """
+
+    def __init__(self, size: int = 2) -> None:
+        """
+        Args:
+        - size: Maximum number of idle teams kept
+        """
+        self.size = size
+        self._idle: List[RoundRobinGroupChat] = []
+        self.leases = 0
+        self.built = 0
+
+    async def start(self) -> "MusicTeamPool":
+        """Build the idle teams up front, e.g. at app startup."""
+        while len(self._idle) < self.size:
+            self._idle.append(await self._build())
+        return self
+
+    async def _build(self) -> RoundRobinGroupChat:
+        self.built += 1
+        return await get_music_team()
+
+    @asynccontextmanager
+    async def lease(self):
+        self.leases += 1
+        team = self._idle.pop() if self._idle else await self._build()
+        try:
+            yield team
+        finally:
+            try:
+                await team.reset()
+            except Exception:
+                # A team that cannot be reset (e.g. stopped mid-run) is dropped
+                team = None
+            if team is not None and len(self._idle) < self.size:
+                self._idle.append(team)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": self.size, "idle": len(self._idle), "leases": self.leases, "built": self.built}
+
+_music_team_pool: Optional[MusicTeamPool] = None
+
+def get_music_team_pool() -> MusicTeamPool:
+    """Shared team pool, created on first use if the app did not start it."""
+    global _music_team_pool
+    if _music_team_pool is None:
+        _music_team_pool = MusicTeamPool(size=MUSIC_TEAM_POOL_SIZE)
+    return _music_team_pool
+
     
 if __name__ == "__main__":
 
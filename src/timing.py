@@ -0,0 +1,205 @@
+import os
+import time
+from collections import defaultdict
+from typing import Any, AsyncGenerator, Callable, Dict, List, Literal, Mapping, Optional, Sequence, Union
+from autogen_core import CancellationToken
+from autogen_core.models import (
+    ChatCompletionClient,
+    CreateResult,
+    LLMMessage,
+    ModelCapabilities,  # type: ignore
+    ModelInfo,
+    RequestUsage,
+)
+from autogen_core.tools import Tool, ToolSchema
+from pydantic import BaseModel
+
+# Record per-stage latencies (the e2e benchmark turns this on)
+CHATTUNE_TIMING = os.getenv("CHATTUNE_TIMING", "0") == "1"
+
+
+def percentile(ordered: List[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not ordered:
+        return 0.0
+    rank = max(1, int(q / 100 * len(ordered) + 0.5))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+class StageTimer:
+    """Latency samples per pipeline stage, in milliseconds.
+
+    Raw samples are kept only when `enabled`; observers (e.g. the /metrics
+    histograms) receive every sample either way. Spans are timed while either is on.
+    """
+
+    def __init__(self, enabled: bool = CHATTUNE_TIMING) -> None:
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.observers: List[Callable[[str, float], None]] = []
+        self.enabled = enabled
+
+    @property
+    def enabled(self) -> bool:
+        return self._enabled
+
+    @enabled.setter
+    def enabled(self, value: bool) -> None:
+        self._enabled = value
+        self.active = value or bool(self.observers)
+
+    def add_observer(self, observer: Callable[[str, float], None]) -> None:
+        """
+        Call `observer(stage, ms)` for every recorded sample
+        Args:
+        - observer: Callback; it runs inline and must be cheap
+        """
+        if observer not in self.observers:
+            self.observers.append(observer)
+        self.active = True
+
+    def remove_observer(self, observer: Callable[[str, float], None]) -> None:
+        if observer in self.observers:
+            self.observers.remove(observer)
+        self.active = self._enabled or bool(self.observers)
+
+    def record(self, stage: str, ms: float) -> None:
+        if self._enabled:
+            self.samples[stage].append(ms)
+        for observer in self.observers:
+            observer(stage, ms)
+
+    def reset(self) -> None:
+        self.samples.clear()
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """count, mean, p50, p95, p99 and max of every stage."""
+        result = {}
+        for stage, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            result[stage] = {
+                "count": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": percentile(ordered, 50),
+                "p95": percentile(ordered, 95),
+                "p99": percentile(ordered, 99),
+                "max": ordered[-1],
+            }
+        return result
+
+
+_timer = StageTimer()
+
+
+def get_timer() -> StageTimer:
+    return _timer
+
+
+def enable_timing(enabled: bool = True) -> None:
+    _timer.enabled = enabled
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        _timer.record(self.stage, (time.perf_counter() - self.start) * 1000)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NoSpan":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(stage: str):
+    """
+    Time a block as one sample of `stage`; a shared no-op when timing and metrics are off
+    Args:
+    - stage: Stage name, e.g. "navigation"
+    """
+    return _Span(stage) if _timer.active else _NO_SPAN
+
+
+class TimedChatCompletionClient(ChatCompletionClient):
+    """Delegating model client that records each completion as a `stage` sample.
+
+    Streaming calls also record the time to the first chunk as `<stage>_first_token`.
+    """
+
+    def __init__(self, client: ChatCompletionClient, stage: str = "llm") -> None:
+        self.client = client
+        self.stage = stage
+
+    async def create(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> CreateResult:
+        with span(self.stage):
+            return await self.client.create(messages, tools=tools, tool_choice=tool_choice,
+                                            json_output=json_output, extra_create_args=extra_create_args,
+                                            cancellation_token=cancellation_token)
+
+    async def create_stream(
+        self,
+        messages: Sequence[LLMMessage],
+        *,
+        tools: Sequence[Tool | ToolSchema] = [],
+        tool_choice: Tool | Literal["auto", "required", "none"] = "auto",
+        json_output: Optional[bool | type[BaseModel]] = None,
+        extra_create_args: Mapping[str, Any] = {},
+        cancellation_token: Optional[CancellationToken] = None,
+    ) -> AsyncGenerator[Union[str, CreateResult], None]:
+        start = time.perf_counter()
+        first = True
+        async for chunk in self.client.create_stream(messages, tools=tools, tool_choice=tool_choice,
+                                                     json_output=json_output, extra_create_args=extra_create_args,
+                                                     cancellation_token=cancellation_token):
+            if first and _timer.active:
+                _timer.record(f"{self.stage}_first_token", (time.perf_counter() - start) * 1000)
+            first = False
+            yield chunk
+        if _timer.active:
+            _timer.record(self.stage, (time.perf_counter() - start) * 1000)
+
+    async def close(self) -> None:
+        await self.client.close()
+
+    def actual_usage(self) -> RequestUsage:
+        return self.client.actual_usage()
+
+    def total_usage(self) -> RequestUsage:
+        return self.client.total_usage()
+
+    def count_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self.client.count_tokens(messages, tools=tools)
+
+    def remaining_tokens(self, messages: Sequence[LLMMessage], *, tools: Sequence[Tool | ToolSchema] = []) -> int:
+        return self.client.remaining_tokens(messages, tools=tools)
+
+    @property
+    def capabilities(self) -> ModelCapabilities:  # type: ignore
+        return self.client.capabilities
+
+    @property
+    def model_info(self) -> ModelInfo:
+        return self.client.model_info
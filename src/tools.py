@@ -1,10 +1,184 @@
+import os
 import re
 import json
+import time
 import asyncio
+import logging
+from pathlib import Path
 from dataclasses import dataclass, asdict
-from typing import List, Optional, Dict, Any, Union
-from playwright.async_api import async_playwright, Page
+from typing import AsyncIterator, List, Optional, Dict, Any, Union
+from contextlib import asynccontextmanager, suppress
+from autogen_core import CancellationToken
+from playwright.async_api import async_playwright, Browser, Page, Response
 from src.models import MusicSearchQuery, MoodEnum, GenreEnum
+from src.cache import MusicSearchCache, SingleFlight
+from src.catalog import CatalogIndex, get_catalog
+from src.routing import NavigationStats, ResourceRouter, StaticAssetCache
+from src.progress import ProgressFanout, report_progress
+from src.timing import get_timer, span
+
+logger = logging.getLogger(__name__)
+
+# Result cache settings (MUSIC_CACHE_TTL=0 disables the cache)
+MUSIC_CACHE_PATH = os.getenv("MUSIC_CACHE_PATH", "music_cache.sqlite3")
+MUSIC_CACHE_TTL = float(os.getenv("MUSIC_CACHE_TTL", str(24 * 3600)))
+MUSIC_CACHE_SIZE = int(os.getenv("MUSIC_CACHE_SIZE", "256"))
+MUSIC_CACHE_GRANULARITY = int(os.getenv("MUSIC_CACHE_GRANULARITY", "10"))
+
+# Lightweight page loading: block heavy resources and serve bundles from a disk cache
+SCRAPER_LIGHTWEIGHT = os.getenv("SCRAPER_LIGHTWEIGHT", "1") == "1"
+SCRAPER_STATIC_CACHE_DIR = os.getenv("SCRAPER_STATIC_CACHE_DIR", ".static_cache")
+
+# Precrawled catalog (see src/crawler.py); older catalogs are ignored in favour of the live site
+MUSIC_CATALOG_PATH = os.getenv("MUSIC_CATALOG_PATH", "music_catalog.json")
+MUSIC_CATALOG_MAX_AGE = float(os.getenv("MUSIC_CATALOG_MAX_AGE", str(30 * 24 * 3600)))
+
+# Songs included in the tool results that go back into model prompts
+MUSIC_TOOL_TOP_K = int(os.getenv("MUSIC_TOOL_TOP_K", "10"))
+
+# Text of the results panel (or the whole page when the panel is not rendered)
+_RESULTS_TEXT_JS = """
+(selector) => {
+    const root = document.querySelector(selector) || document.body;
+    return root.innerText || "";
+}
+"""
+
+# Geometry and value of a slider (role=slider, in page order), scrolled into view
+_SLIDER_JS = """
+(idx) => {
+    const el = document.querySelectorAll("[role=slider]")[idx];
+    if (!el) return null;
+    el.scrollIntoView({block: "center"});
+    const box = el.getBoundingClientRect();
+    const num = (name, fallback) => {
+        const v = parseFloat(el.getAttribute(name));
+        return Number.isNaN(v) ? fallback : v;
+    };
+    return {x: box.left, y: box.top, width: box.width, height: box.height,
+            value: num("aria-valuenow", null), min: num("aria-valuemin", 0), max: num("aria-valuemax", 100)};
+}
+"""
+
+# Step a slider with `count` arrow-key events in one round trip (after Home when
+# `home` is set); returns its new value
+_SLIDER_KEYS_JS = """
+({idx, key, count, home}) => {
+    const el = document.querySelectorAll("[role=slider]")[idx];
+    if (!el) return null;
+    el.focus();
+    const press = (k) => el.dispatchEvent(new KeyboardEvent("keydown", {key: k, code: k, bubbles: true, cancelable: true}));
+    if (home) press("Home");
+    for (let i = 0; i < count; i++) {
+        press(key);
+    }
+    const v = parseFloat(el.getAttribute("aria-valuenow"));
+    return Number.isNaN(v) ? null : v;
+}
+"""
+
+# Click the genre chips with the given lower-case labels in one round trip. A chip is
+# the innermost element whose whole text is the label, outside the results panel
+# (whose cards list genres too). Returns the labels that were not found.
+_TOGGLE_GENRES_JS = """
+({labels, results}) => {
+    const panel = document.querySelector(results);
+    const missing = [];
+    for (const label of labels) {
+        const chip = [...document.querySelectorAll("body *")].find((el) =>
+            (el.textContent || "").trim().toLowerCase() === label
+            && ![...el.children].some((c) => (c.textContent || "").trim().toLowerCase() === label)
+            && !(panel && panel.contains(el))
+            && !el.closest("a, [role=slider]"));
+        if (chip) chip.click(); else missing.push(label);
+    }
+    return missing;
+}
+"""
+
+# Resolve once the results panel shows the heading and has stopped mutating for
+# settleMs, either with text different from `before` ("changed") or, after graceMs,
+# with identical text ("unchanged", e.g. the same query twice). Gives up at timeoutMs.
+_WAIT_FOR_RESULTS_JS = """
+({selector, heading, before, settleMs, graceMs, timeoutMs}) => new Promise((resolve) => {
+    const start = performance.now();
+    let lastMutation = start;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document.body, {childList: true, subtree: true, characterData: true});
+    const text = () => {
+        const root = document.querySelector(selector) || document.body;
+        return root.innerText || "";
+    };
+    const finish = (status) => {
+        observer.disconnect();
+        resolve(status);
+    };
+    const tick = () => {
+        const now = performance.now();
+        const current = text();
+        const quiet = current.includes(heading) && now - lastMutation >= settleMs;
+        if (quiet && current !== before) return finish("changed");
+        if (quiet && now - start >= graceMs) return finish("unchanged");
+        if (now - start >= timeoutMs) return finish("timeout");
+        setTimeout(tick, 50);
+    };
+    tick();
+})
+"""
+
+# Extract every result card as structured data in a single round trip. A card is the
+# largest ancestor of a duration label ("3:45") that contains no other duration; its
+# lines are title, artist, lower-case genres, duration. Without durations, Spotify
+# track links are used as cards instead.
+_EXTRACT_CARDS_JS = """
+({selector, heading, limit}) => {
+    const isDuration = (s) => /^\\d{1,2}:\\d{2}$/.test(s);
+    const linesOf = (el) => (el.innerText || "").split("\\n").map((s) => s.trim()).filter(Boolean);
+    let root = document.querySelector(selector);
+    if (!root || !(root.innerText || "").includes(heading)) {
+        root = document.body;
+    }
+
+    const leaves = [...root.querySelectorAll("*")].filter(
+        (el) => el.childElementCount === 0 && isDuration((el.textContent || "").trim())
+    );
+    const counts = new Map();
+    for (const leaf of leaves) {
+        for (let p = leaf.parentElement; p && p !== root; p = p.parentElement) {
+            counts.set(p, (counts.get(p) || 0) + 1);
+        }
+    }
+    let cards = leaves.map((leaf) => {
+        let card = leaf;
+        while (card.parentElement && card.parentElement !== root && counts.get(card.parentElement) === 1) {
+            card = card.parentElement;
+        }
+        return card;
+    });
+    if (!cards.length) {
+        cards = [...root.querySelectorAll("a[href*='open.spotify.com/track']")];
+    }
+
+    const results = [];
+    for (const card of cards.slice(0, limit)) {
+        const lines = linesOf(card).filter((s) => s !== heading);
+        if (!lines.length) continue;
+        const durationIdx = lines.findIndex(isDuration);
+        const meta = lines.slice(2, durationIdx >= 0 ? durationIdx : lines.length);
+        const anchor = card.matches("a[href*='open.spotify.com']")
+            ? card
+            : card.querySelector("a[href*='open.spotify.com']") || card.closest("a[href*='open.spotify.com']");
+        results.push({
+            title: lines[0],
+            artist: lines.length > 1 && lines[1] !== lines[durationIdx] ? lines[1] : null,
+            genres: meta.filter((s) => s === s.toLowerCase() && /[a-z]/.test(s)),
+            duration: durationIdx >= 0 ? lines[durationIdx] : null,
+            link: anchor ? anchor.href : null,
+        });
+    }
+    return results;
+}
+"""
 
 @dataclass
 class Song:
@@ -14,115 +188,361 @@ class Song:
     extra: Optional[Dict[str, Any]] = None
 
 
+def encode_songs(songs: List[Song], top_k: Optional[int] = None) -> str:
+    """Compact, deterministic text of songs for model prompts.
+
+    One line per song, ``N. Title - Artist (genre, genre; duration)``, with missing
+    fields left out. Links are omitted: they cost many tokens and the model never
+    needs them (the UI gets them from the progress events).
+
+    Args:
+        songs: Songs in ranking order
+        top_k: Keep only the first ``top_k`` songs (default ``MUSIC_TOOL_TOP_K``)
+    """
+    top_k = MUSIC_TOOL_TOP_K if top_k is None else top_k
+    if not songs:
+        return "No songs found."
+    lines = []
+    for i, song in enumerate(songs[:top_k], 1):
+        extra = song.extra or {}
+        line = f"{i}. {song.title}" + (f" - {song.artist}" if song.artist else "")
+        details = "; ".join(d for d in (", ".join(extra.get("genres") or []), extra.get("duration")) if d)
+        lines.append(f"{line} ({details})" if details else line)
+    return "\n".join(lines)
+
+
+# Keys that recommendation payloads commonly use for the song fields
+_TITLE_KEYS = ("title", "name", "track_name", "trackName", "song")
+_ARTIST_KEYS = ("artist", "artists", "artist_name", "artistName")
+_LINK_KEYS = ("spotify_url", "spotifyUrl", "url", "link", "href")
+
+
+def _find_song_list(payload: Any, depth: int = 0) -> Optional[List[Dict[str, Any]]]:
+    """Depth-first search for the first list of objects with title and artist fields."""
+    if depth > 4:
+        return None
+    if isinstance(payload, list):
+        items = [item for item in payload if isinstance(item, dict)]
+        if items and any(k in items[0] for k in _TITLE_KEYS) and any(k in items[0] for k in _ARTIST_KEYS):
+            return items
+        children = payload
+    elif isinstance(payload, dict):
+        children = payload.values()
+    else:
+        return None
+    for child in children:
+        found = _find_song_list(child, depth + 1)
+        if found:
+            return found
+    return None
+
+
+def _name_of(value: Any) -> Optional[str]:
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return value.get("name")
+    if isinstance(value, list):
+        names = [n for n in (_name_of(v) for v in value) if n]
+        return ", ".join(names) or None
+    return None
+
+
+def songs_from_payload(payload: Any, limit: int = 20) -> List[Song]:
+    """Build songs from a JSON recommendation payload; empty if it has no song list."""
+    items = _find_song_list(payload)
+    if not items:
+        return []
+    songs: List[Song] = []
+    for item in items[:limit]:
+        title = next((_name_of(item[k]) for k in _TITLE_KEYS if item.get(k)), None)
+        if not title:
+            continue
+        artist = next((_name_of(item[k]) for k in _ARTIST_KEYS if item.get(k)), None)
+        link = next((item[k] for k in _LINK_KEYS if isinstance(item.get(k), str)), None)
+        spotify = (item.get("external_urls") or {}).get("spotify") if isinstance(item.get("external_urls"), dict) else None
+        duration = item.get("duration")
+        if duration is None and isinstance(item.get("duration_ms"), (int, float)):
+            seconds = int(item["duration_ms"] // 1000)
+            duration = f"{seconds // 60}:{seconds % 60:02d}"
+        genres = item.get("genres") or ([item["genre"]] if isinstance(item.get("genre"), str) else [])
+        songs.append(Song(title=title, artist=artist, link=spotify or link, extra={
+            "genres": [str(g).lower() for g in genres],
+            "duration": duration,
+        }))
+    return songs
+
+
 class MusicByMoodScraper:
     BASE_URL = "https://www.musicbymood.com/"
+    RESULTS_SELECTOR = ".order-1.md\\:order-2, .md\\:order-2"
+    RESULTS_HEADING = "Recommended for your mood"
+    # DOM-path "auto" searches after which the recommendation response is probed again
+    NETWORK_REPROBE_SEARCHES = 20
 
-    def __init__(self, headless: bool = True, timeout_ms: int = 30000) -> None:
+    def __init__(self, headless: bool = True, timeout_ms: int = 30000, browser: Optional[Browser] = None,
+                 lightweight: bool = SCRAPER_LIGHTWEIGHT) -> None:
         self.headless = headless
         self.timeout_ms = timeout_ms
-        self._browser = None
+        self.lightweight = lightweight
+        self._router: Optional[ResourceRouter] = None
+        # Request/byte counters of the last goto() (lightweight mode only)
+        self.last_navigation_stats: Optional[NavigationStats] = None
+        self._pw = None
+        # A shared browser (e.g. from ScraperPool) is borrowed, never launched or closed here
+        self._browser = browser
+        self._owns_browser = browser is None
         self._context = None
         self._page: Optional[Page] = None
+        # Number of queries served by the current page (used by ScraperPool recycling)
+        self.uses = 0
+        # Time apply_query spent waiting for results on its last call
+        self.last_wait_ms: Optional[float] = None
+        # Results panel text captured right before the last search was triggered
+        self._results_before: Optional[str] = None
+        # Filters the page currently shows (mood, explicitly set levels, genres);
+        # None when unknown, which makes the next query reload the page first
+        self._filters: Optional[Dict[str, Any]] = None
+        # Whether the site returned recommendations in a JSON response on this
+        # scraper's last probe; None until an "auto" search finds out
+        self.network_results: Optional[bool] = None
+        # "auto" searches served from the DOM since that probe
+        self._dom_searches = 0
 
     async def __aenter__(self):
-        self._pw = await async_playwright().start()
-        self._browser = await self._pw.chromium.launch(headless=self.headless)
-        self._context = await self._browser.new_context()
-        self._page = await self._context.new_page()
+        with span("browser_launch"):
+            if self._owns_browser:
+                self._pw = await async_playwright().start()
+                self._browser = await self._pw.chromium.launch(headless=self.headless)
+            await self.open()
         return self
 
     async def __aexit__(self, exc_type, exc, tb):
+        try:
+            await self.close()
+            if self._owns_browser and self._browser:
+                await self._browser.close()
+        finally:
+            if self._pw:
+                await self._pw.stop()
+
+    async def open(self):
+        """Open a fresh context and page on the browser."""
+        assert self._browser
+        self._context = await self._browser.new_context()
+        if self.lightweight:
+            self._router = ResourceRouter(cache=get_static_cache())
+            await self._router.install(self._context)
+        self._page = await self._context.new_page()
+        self._filters = None
+        self.uses = 0
+
+    async def close(self):
+        """Close the current context and page, leaving the browser running."""
         try:
             if self._context:
                 await self._context.close()
-            if self._browser:
-                await self._browser.close()
         finally:
-            await self._pw.stop()
+            self._context = None
+            self._page = None
+            self._filters = None
 
     async def goto(self):
         assert self._page
-        await self._page.goto(self.BASE_URL, timeout=self.timeout_ms)
-        # Ensure main UI is visible
-        await self._page.get_by_text("MusicByMood").wait_for(timeout=self.timeout_ms)
+        if self._router:
+            self._router.reset()
+        with span("navigation"):
+            await self._page.goto(self.BASE_URL, timeout=self.timeout_ms)
+            # Ensure main UI is visible
+            await self._page.get_by_text("MusicByMood").wait_for(timeout=self.timeout_ms)
+        if self._router:
+            self.last_navigation_stats = self._router.reset()
+            logger.debug("Navigation stats: %s", self.last_navigation_stats)
+        self._filters = {"mood": None, "energy": None, "happiness": None, "genres": set()}
+
+    def needs_reset(self, query: MusicSearchQuery) -> bool:
+        """Whether the page must be reloaded before `query` can be applied as a diff.
+
+        Filters are changed in place, but a mood or slider the query leaves unset
+        cannot be cleared that way, nor can a page whose state is unknown.
+        """
+        current = self._filters
+        if current is None:
+            return True
+        return ((current["mood"] is not None and query.mood is None)
+                or (current["energy"] is not None and query.energy_level is None)
+                or (current["happiness"] is not None and query.happiness_level is None))
+
+    async def set_slider(self, idx: int, value: int) -> Optional[float]:
+        """Set a slider with one click at the computed track position, then verify.
+
+        The value is read from ``aria-valuenow`` before and after; a click that
+        lands off by a few steps (rounding, track padding) is corrected with
+        arrow-key events dispatched in one round trip, and a slider without
+        geometry is set with keys alone.
+
+        Returns:
+            The slider's final value, or None if it could not be read
+        """
+        assert self._page
+        page = self._page
+        try:
+            info = await page.evaluate(_SLIDER_JS, idx)
+        except Exception as e:
+            logger.debug("Could not read slider %d: %s", idx, e)
+            return None
+        if not info:
+            return None
+        lo, hi = info["min"], info["max"]
+        if hi <= lo:
+            # A one-value (or misconfigured) range has no position to click or step to
+            logger.debug("Slider %d has an empty range [%s, %s]", idx, lo, hi)
+            return info["value"]
+        target = max(lo, min(hi, value))
+        current = info["value"]
+        if current == target:
+            return current
+        if info["width"] > 0:
+            x = info["x"] + info["width"] * (target - lo) / (hi - lo)
+            try:
+                await page.mouse.click(x, info["y"] + info["height"] / 2)
+                current = (await page.evaluate(_SLIDER_JS, idx) or {}).get("value")
+            except Exception as e:
+                logger.debug("Slider %d click failed: %s", idx, e)
+        elif current is None:
+            # No track to click and no value to step from: Home, then one computed jump
+            try:
+                return await page.evaluate(_SLIDER_KEYS_JS, {
+                    "idx": idx, "key": "ArrowRight", "count": int(round(target - lo)), "home": True,
+                })
+            except Exception as e:
+                logger.debug("Slider %d keys failed: %s", idx, e)
+                return None
+        if current is not None and current != target:
+            delta = int(round(target - current))
+            try:
+                current = await page.evaluate(_SLIDER_KEYS_JS, {
+                    "idx": idx, "key": "ArrowRight" if delta > 0 else "ArrowLeft", "count": abs(delta), "home": False,
+                })
+            except Exception as e:
+                logger.debug("Slider %d key correction failed: %s", idx, e)
+            if current != target:
+                logger.warning("Slider %d is at %s instead of %s", idx, current, target)
+        return current
+
+    async def wait_for_results(self, before: Optional[str] = None, timeout_ms: int = 10000,
+                               settle_ms: int = 300, grace_ms: int = 1500) -> float:
+        """Wait until the result list has changed and settled.
 
-    async def apply_query(self, query: MusicSearchQuery):
+        Args:
+            before: Results panel text captured before the search was triggered
+            timeout_ms: Hard upper bound on the wait
+            settle_ms: Quiet period without DOM mutations that counts as settled
+            grace_ms: How long to wait for a change before accepting identical results
+
+        Returns:
+            The measured wait in milliseconds (also stored in ``last_wait_ms``)
+        """
+        assert self._page
+        page = self._page
+        start = time.perf_counter()
+        try:
+            status = await page.evaluate(_WAIT_FOR_RESULTS_JS, {
+                "selector": self.RESULTS_SELECTOR,
+                "heading": self.RESULTS_HEADING,
+                "before": before,
+                "settleMs": settle_ms,
+                "graceMs": grace_ms,
+                "timeoutMs": timeout_ms,
+            })
+        except Exception:
+            # Evaluation failed (e.g. the page navigated): fall back to the heading
+            status = "fallback"
+            remaining = timeout_ms - (time.perf_counter() - start) * 1000
+            # Playwright reads timeout=0 as "no timeout": past the deadline, do not wait at all
+            if remaining < 1:
+                status = "timeout"
+            else:
+                try:
+                    await page.get_by_text(self.RESULTS_HEADING).wait_for(timeout=remaining)
+                except Exception:
+                    status = "timeout"
+        self.last_wait_ms = (time.perf_counter() - start) * 1000
+        if get_timer().active:
+            get_timer().record("results_wait", self.last_wait_ms)
+        logger.debug("Results %s after %.0f ms", status, self.last_wait_ms)
+        return self.last_wait_ms
+
+    async def apply_query(self, query: MusicSearchQuery, ready_timeout_ms: int = 10000, wait: bool = True) -> float:
+        """Apply the query on the page, trigger the search and wait for results.
+
+        With ``wait=False`` the search is only triggered; the caller waits itself.
+
+        Returns:
+            The time spent waiting for results in milliseconds
+        """
         assert self._page
         page = self._page
         
-        print(f"DEBUG: Applying query - mood: {query.mood}, energy: {query.energy_level}, happiness: {query.happiness_level}, genres: {query.genres}")
+        logger.debug("Applying query - mood: %s, energy: %s, happiness: %s, genres: %s",
+                     query.mood, query.energy_level, query.happiness_level, query.genres)
+        if self.needs_reset(query):
+            await self.goto()
+        current = self._filters
+        # Unknown until every filter is applied, so a failure forces a reload next time
+        self._filters = None
+        genres = {str(g).lower() for g in query.genres or []}
 
-        # 1) Click mood button if provided
-        if query.mood:
-            print(f"DEBUG: Clicking mood button: {query.mood}")
+        # 1) Click mood button if it changed
+        mood = current["mood"]
+        if query.mood and query.mood != mood:
             try:
                 await page.get_by_role("button", name=str(query.mood)).click(timeout=3000)
-                print(f"DEBUG: Successfully clicked mood button: {query.mood}")
+                mood = query.mood
             except Exception as e:
-                print(f"DEBUG: Failed to click mood button with role, trying text locator: {e}")
+                logger.debug("Failed to click mood button with role, trying text locator: %s", e)
                 try:
                     await page.get_by_text(str(query.mood), exact=True).click(timeout=3000)
-                    print(f"DEBUG: Successfully clicked mood button with text locator: {query.mood}")
+                    mood = query.mood
                 except Exception as e2:
-                    print(f"DEBUG: Failed to click mood button entirely: {e2}")
-
-        # 2) Adjust sliders (Energy, Happiness) if provided
-        # The page renders custom sliders with role=slider; Energy is first, Happiness is second
-        sliders = page.get_by_role("slider")
-
-        async def set_slider(idx: int, percentage: int):
-            if percentage is None:
-                return
-            try:
-                handle = sliders.nth(idx)
-                box = await handle.bounding_box()
-                if not box:
-                    return
-                # Move to x at percentage across the track
-                target_x = box["x"] + (box["width"] * (percentage / 100.0))
-                target_y = box["y"] + box["height"] / 2
-                await page.mouse.move(box["x"] + box["width"] / 2, target_y)
-                await page.mouse.down()
-                await page.mouse.move(target_x, target_y, steps=10)
-                await page.mouse.up()
-            except Exception:
-                # Fallback: try arrow keys if slider is focusable
-                try:
-                    await handle.focus()
-                    current_steps = 50  # assume midpoint; adjust towards percentage
-                    target_steps = max(0, min(100, percentage))
-                    delta = target_steps - current_steps
-                    key = "ArrowRight" if delta > 0 else "ArrowLeft"
-                    for _ in range(abs(delta)):
-                        await handle.press(key)
-                except Exception:
-                    pass
+                    logger.warning("Failed to click mood button %s: %s", query.mood, e2)
 
+        # 2) Adjust sliders (Energy, Happiness) if provided; the page renders custom
+        # sliders with role=slider, Energy first and Happiness second
         if query.energy_level is not None:
-            print(f"DEBUG: Setting energy slider to {query.energy_level}%")
-            await set_slider(0, int(query.energy_level))
+            await self.set_slider(0, int(query.energy_level))
         if query.happiness_level is not None:
-            print(f"DEBUG: Setting happiness slider to {query.happiness_level}%")
-            await set_slider(1, int(query.happiness_level))
-
-        # 3) Select genres
-        if query.genres:
-            print(f"DEBUG: Selecting genres: {query.genres}")
-            for g in query.genres:
-                # Site genres appear lower-case; map enum to lower-case label
-                label = str(g).lower()
-                print(f"DEBUG: Trying to click genre: {label}")
+            await self.set_slider(1, int(query.happiness_level))
+
+        # 3) Toggle only the genres that differ from the page
+        toggle = sorted(genres ^ current["genres"])
+        failed: set = set()
+        if toggle:
+            try:
+                missing = await page.evaluate(_TOGGLE_GENRES_JS, {"labels": toggle, "results": self.RESULTS_SELECTOR})
+            except Exception as e:
+                logger.debug("In-page genre toggle failed: %s", e)
+                missing = toggle
+            for label in missing:
+                # Fallback: text locator anywhere
                 try:
-                    await page.locator("div", has_text=label).first.click(timeout=2000)
-                    print(f"DEBUG: Successfully clicked genre: {label}")
+                    await page.get_by_text(label, exact=True).first.click(timeout=1500)
                 except Exception as e:
-                    print(f"DEBUG: Failed to click genre with div locator: {e}")
-                    # Fallback: text locator anywhere
-                    try:
-                        await page.get_by_text(label).first.click(timeout=1500)
-                        print(f"DEBUG: Successfully clicked genre with text locator: {label}")
-                    except Exception as e2:
-                        print(f"DEBUG: Failed to click genre entirely: {e2}")
+                    failed.add(label)
+                    logger.warning("Failed to click genre %s: %s", label, e)
+
+        self._filters = {
+            "mood": mood,
+            "energy": query.energy_level,
+            "happiness": query.happiness_level,
+            "genres": genres ^ failed,
+        }
+
+        # Snapshot current results so the wait can tell when they are replaced
+        try:
+            self._results_before = await page.evaluate(_RESULTS_TEXT_JS, self.RESULTS_SELECTOR)
+        except Exception:
+            self._results_before = None
 
         # 4) Trigger search
         try:
@@ -131,17 +551,152 @@ class MusicByMoodScraper:
             # Fallback: click by text
             await page.get_by_text("Find My Music").click(timeout=5000)
 
-        # Wait for results to appear: prefer the heading "Recommended for your mood"
+        if not wait:
+            return 0.0
+        # Wait until the result list has actually changed and settled
+        return await self.wait_for_results(self._results_before, timeout_ms=ready_timeout_ms)
+
+    async def search(self, query: MusicSearchQuery, limit: int = 20, source: str = "auto",
+                     ready_timeout_ms: int = 10000, network_timeout_ms: int = 3000) -> List[Song]:
+        """Apply the query and return the recommended songs.
+
+        Args:
+            query: The search to run
+            limit: Maximum number of songs to return
+            source: "network" builds songs from the site's recommendation response,
+                "dom" extracts them from the rendered page, "auto" tries the network
+                (unless a recent search of this scraper found no such response) and falls
+                back to the DOM
+            ready_timeout_ms: Upper bound on the wait for rendered results
+            network_timeout_ms: Upper bound on the wait for a recommendation response
+        """
+        return [song async for song in self.iter_search(query, limit=limit, source=source,
+                                                        ready_timeout_ms=ready_timeout_ms,
+                                                        network_timeout_ms=network_timeout_ms)]
+
+    async def iter_search(self, query: MusicSearchQuery, limit: int = 20, source: str = "auto",
+                          ready_timeout_ms: int = 10000, network_timeout_ms: int = 3000) -> AsyncIterator[Song]:
+        """Like `search`, but yields each song as soon as it has been parsed."""
+        if source not in ("auto", "network", "dom"):
+            raise ValueError(f"Unknown result source: {source}")
+        assert self._page
+        page = self._page
+        # Reload before listening for responses, so page loads are not taken for results
+        if self.needs_reset(query):
+            await self.goto()
+        use_network = source == "network" or (source == "auto" and (
+            self.network_results is not False or self._dom_searches >= self.NETWORK_REPROBE_SEARCHES))
+        if not use_network:
+            self._dom_searches += 1
+            with span("apply_query"):
+                await self.apply_query(query, wait=False)
+            await self.wait_for_results(self._results_before, timeout_ms=ready_timeout_ms)
+            async for song in self.iter_results(limit=limit):
+                yield song
+            return
+
+        responses: "asyncio.Queue[Response]" = asyncio.Queue()
+
+        def on_response(response: Response) -> None:
+            if (response.request.resource_type in ("xhr", "fetch")
+                    and "json" in response.headers.get("content-type", "")):
+                responses.put_nowait(response)
+
+        page.on("response", on_response)
         try:
-            await page.get_by_text("Recommended for your mood").wait_for(timeout=10000)
-            # Wait longer for the song list to populate after UI changes
-            print("DEBUG: Waiting for results to update after query...")
-            await page.wait_for_timeout(5000)
-        except Exception:
-            # Fallback: longer delay to ensure content loads
-            await page.wait_for_timeout(7000)
+            with span("apply_query"):
+                await self.apply_query(query, wait=False)
+            with span("network_results"):
+                songs = await self._songs_from_responses(responses, limit, network_timeout_ms)
+        finally:
+            page.remove_listener("response", on_response)
+        if source == "auto":
+            # Remember whether the site exposes its data so later searches skip the wait;
+            # a miss (or a slow response) is probed again after NETWORK_REPROBE_SEARCHES
+            self.network_results = bool(songs)
+            self._dom_searches = 0
+        if songs:
+            logger.debug("Built %d songs from the recommendation response", len(songs))
+            for song in songs:
+                yield song
+            return
+
+        await self.wait_for_results(self._results_before, timeout_ms=ready_timeout_ms)
+        async for song in self.iter_results(limit=limit):
+            yield song
+
+    async def _songs_from_responses(self, responses: "asyncio.Queue[Response]", limit: int,
+                                    timeout_ms: int) -> List[Song]:
+        """Parse captured JSON responses until one looks like a song list."""
+        deadline = time.perf_counter() + timeout_ms / 1000
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                return []
+            try:
+                response = await asyncio.wait_for(responses.get(), timeout=remaining)
+                payload = await response.json()
+            except asyncio.TimeoutError:
+                return []
+            except Exception:
+                continue
+            songs = songs_from_payload(payload, limit)
+            if songs:
+                return songs
+
+    async def extract_results(self, limit: int = 20, mode: str = "auto") -> List[Song]:
+        """Extract the recommended songs from the page.
+
+        Args:
+            limit: Maximum number of songs to return
+            mode: "script" runs one in-page script returning structured cards, "text"
+                uses the text heuristics, "auto" tries the script and falls back to text
+        """
+        return [song async for song in self.iter_results(limit=limit, mode=mode)]
+
+    async def iter_results(self, limit: int = 20, mode: str = "auto") -> AsyncIterator[Song]:
+        """Like `extract_results`, but yields each song as soon as it has been parsed."""
+        if mode not in ("auto", "script", "text"):
+            raise ValueError(f"Unknown extraction mode: {mode}")
+        if mode in ("auto", "script"):
+            found = False
+            async for song in self._iter_structured(limit):
+                found = True
+                yield song
+            if found or mode == "script":
+                return
+        for song in await self._extract_text(limit):
+            yield song
+
+    async def _iter_structured(self, limit: int) -> AsyncIterator[Song]:
+        assert self._page
+        try:
+            with span("extract"):
+                cards = await self._page.evaluate(_EXTRACT_CARDS_JS, {
+                    "selector": self.RESULTS_SELECTOR,
+                    "heading": self.RESULTS_HEADING,
+                    "limit": limit * 2,
+                })
+        except Exception as e:
+            logger.warning("Structured extraction failed: %s", e)
+            return
+
+        count = 0
+        seen = set()
+        for card in cards:
+            key = (card["title"], card["artist"])
+            if key in seen:
+                continue
+            seen.add(key)
+            yield Song(title=card["title"], artist=card["artist"], link=card["link"], extra={
+                "genres": card["genres"],
+                "duration": card["duration"],
+            })
+            count += 1
+            if count >= limit:
+                break
 
-    async def extract_results(self, limit: int = 20) -> List[Song]:
+    async def _extract_text(self, limit: int) -> List[Song]:
         assert self._page
         page = self._page
         songs: List[Song] = []
@@ -169,7 +724,7 @@ class MusicByMoodScraper:
         try:
             # Try multiple selectors to find the results container
             selectors_to_try = [
-                ".order-1.md\\:order-2, .md\\:order-2",
+                self.RESULTS_SELECTOR,
                 "div:has-text('Recommended for your mood')",
                 "body",  # Fallback to full page
             ]
@@ -243,7 +798,7 @@ class MusicByMoodScraper:
 
         # Heuristic 1: right panel container (results) – grab links or card texts
         try:
-            results_container = page.locator(".order-1.md\\:order-2, .md\\:order-2")
+            results_container = page.locator(self.RESULTS_SELECTOR)
             if await results_container.count() > 0:
                 container = results_container.first
                 # Try Spotify track links first
@@ -299,7 +854,210 @@ class MusicByMoodScraper:
         return songs[:limit]
 
 
-async def search_music_by_mood(mood: Optional[str] = None, energy_level: Optional[int] = None, happiness_level: Optional[int] = None, genres: Optional[list] = None, headless: bool = True, limit: int = 20) -> List[Song]:
+class ScraperPool:
+    """Long-lived pool of warm MusicByMood pages sharing a single Chromium.
+
+    Each slot keeps its own context and page already loaded on the site. Queries
+    lease a slot with ``checkout``/``checkin`` (or the ``lease`` context manager),
+    so at most ``size`` scrapes run at once and callers beyond that wait in line.
+    A slot is recycled with a fresh context after ``max_uses`` leases or after any
+    error; otherwise its page is kept as is and the next query only changes the
+    filters that differ (``apply_query`` reloads the page when it cannot). If the
+    shared Chromium crashes or disconnects, it is relaunched before the next slot
+    is warmed.
+    """
+
+    def __init__(self, size: int = 2, max_uses: int = 25, headless: bool = True, timeout_ms: int = 30000) -> None:
+        if size < 1:
+            raise ValueError(f"Pool size must be at least 1, got {size}")
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.timeout_ms = timeout_ms
+        self._pw = None
+        self._browser: Optional[Browser] = None
+        self._idle: "asyncio.Queue[MusicByMoodScraper]" = asyncio.Queue()
+        self._pending: set = set()
+        # Serializes relaunches of a crashed browser across slots
+        self._browser_lock = asyncio.Lock()
+        self.relaunches = 0
+
+    @property
+    def in_use(self) -> int:
+        """Number of slots currently leased or being reset."""
+        return self.size - self._idle.qsize()
+
+    async def start(self) -> "ScraperPool":
+        self._pw = await async_playwright().start()
+        try:
+            self._browser = await self._pw.chromium.launch(headless=self.headless)
+        except BaseException:
+            await self.stop()
+            raise
+        scrapers = [
+            MusicByMoodScraper(headless=self.headless, timeout_ms=self.timeout_ms, browser=self._browser)
+            for _ in range(self.size)
+        ]
+        # Warm all slots concurrently; a slot that fails to warm is retried on checkout
+        results = await asyncio.gather(*(self._warm(s) for s in scrapers), return_exceptions=True)
+        for scraper, result in zip(scrapers, results):
+            if isinstance(result, BaseException):
+                with suppress(Exception):
+                    await scraper.close()
+            self._idle.put_nowait(scraper)
+        return self
+
+    async def stop(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        while not self._idle.empty():
+            with suppress(Exception):
+                await self._idle.get_nowait().close()
+        try:
+            if self._browser:
+                await self._browser.close()
+        finally:
+            self._browser = None
+            if self._pw:
+                await self._pw.stop()
+                self._pw = None
+
+    def _browser_alive(self) -> bool:
+        return self._browser is not None and self._browser.is_connected()
+
+    async def _ensure_browser(self) -> None:
+        """Relaunch the shared browser if it crashed or disconnected."""
+        if self._browser_alive():
+            return
+        async with self._browser_lock:
+            if self._browser_alive():
+                return
+            logger.warning("Scraper pool browser disconnected, relaunching it")
+            if self._browser is not None:
+                with suppress(Exception):
+                    await self._browser.close()
+                self._browser = None
+            with span("browser_launch"):
+                self._browser = await self._pw.chromium.launch(headless=self.headless)
+            self.relaunches += 1
+
+    async def _warm(self, scraper: MusicByMoodScraper) -> None:
+        await self._ensure_browser()
+        # Slots opened on a browser that has since been replaced move to the new one
+        scraper._browser = self._browser
+        with span("browser_launch"):
+            await scraper.open()
+        await scraper.goto()
+
+    async def checkout(self) -> MusicByMoodScraper:
+        """Wait for an idle slot and return its scraper, ready on the site."""
+        scraper = await self._idle.get()
+        if scraper._page is None or scraper._browser is not self._browser or not self._browser_alive():
+            try:
+                with suppress(Exception):
+                    await scraper.close()
+                await self._warm(scraper)
+            except BaseException:
+                with suppress(Exception):
+                    await scraper.close()
+                self._idle.put_nowait(scraper)
+                raise
+        return scraper
+
+    async def checkin(self, scraper: MusicByMoodScraper, failed: bool = False) -> None:
+        """Return a leased scraper, recycling its page first if needed."""
+        scraper.uses += 1
+        try:
+            if failed or scraper.uses >= self.max_uses:
+                await scraper.close()
+                await self._warm(scraper)
+        except Exception:
+            # Leave the slot cold; the next checkout warms it again
+            with suppress(Exception):
+                await scraper.close()
+        finally:
+            self._idle.put_nowait(scraper)
+
+    @asynccontextmanager
+    async def lease(self):
+        scraper = await self.checkout()
+        failed = False
+        try:
+            yield scraper
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            # Reset off the caller's critical path
+            task = asyncio.create_task(self.checkin(scraper, failed=failed))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+
+# Shared pool installed by the app at startup (see chat_app.lifespan)
+_scraper_pool: Optional[ScraperPool] = None
+
+
+def set_scraper_pool(pool: Optional[ScraperPool]) -> None:
+    global _scraper_pool
+    _scraper_pool = pool
+
+
+# Out-of-process workers installed by the app at startup (see src/workers.py); they
+# take precedence over the in-process pool
+_scraper_workers = None
+
+
+def set_scraper_workers(workers) -> None:
+    global _scraper_workers
+    _scraper_workers = workers
+
+
+def get_scraper_workers():
+    return _scraper_workers
+
+
+_static_cache: Optional[StaticAssetCache] = None
+_music_cache: Optional[MusicSearchCache] = None
+# Concurrent identical searches await one shared scrape
+_search_flights = SingleFlight()
+# Song events of each in-flight scrape, relayed to every caller waiting on it
+_search_progress: Dict[str, ProgressFanout] = {}
+
+
+def get_search_flights() -> SingleFlight:
+    return _search_flights
+
+
+def get_static_cache() -> Optional[StaticAssetCache]:
+    """Static bundle cache shared by all scraper contexts; None when disabled."""
+    global _static_cache
+    if _static_cache is None and SCRAPER_STATIC_CACHE_DIR:
+        _static_cache = StaticAssetCache(Path(SCRAPER_STATIC_CACHE_DIR))
+    return _static_cache
+
+
+def get_music_catalog() -> Optional[CatalogIndex]:
+    """Precrawled catalog if present and fresh, else None."""
+    if not MUSIC_CATALOG_PATH:
+        return None
+    return get_catalog(Path(MUSIC_CATALOG_PATH), max_age_seconds=MUSIC_CATALOG_MAX_AGE)
+
+
+def get_music_cache() -> Optional[MusicSearchCache]:
+    """Shared result cache, created on first use; None when disabled."""
+    global _music_cache
+    if _music_cache is None and MUSIC_CACHE_TTL > 0:
+        _music_cache = MusicSearchCache(
+            path=Path(MUSIC_CACHE_PATH) if MUSIC_CACHE_PATH else None,
+            max_entries=MUSIC_CACHE_SIZE,
+            ttl_seconds=MUSIC_CACHE_TTL,
+            granularity=MUSIC_CACHE_GRANULARITY,
+        )
+    return _music_cache
+
+
+async def search_music_by_mood(mood: Optional[str] = None, energy_level: Optional[int] = None, happiness_level: Optional[int] = None, genres: Optional[list] = None, headless: bool = True, limit: int = 20, cancellation_token: Optional[CancellationToken] = None) -> List[Song]:
     """High-level utility to search songs on MusicByMood from a MusicSearchQuery.
 
     Args:
@@ -309,6 +1067,8 @@ async def search_music_by_mood(mood: Optional[str] = None, energy_level: Optiona
         genres: List of music genres to filter by
         headless: Whether to run browser in headless mode
         limit: Maximum number of songs to return
+        cancellation_token: Cancels the search, closing its browser page (injected
+            when called as an agent tool)
     """
     # Convert individual parameters to MusicSearchQuery
     query = MusicSearchQuery(
@@ -318,11 +1078,121 @@ async def search_music_by_mood(mood: Optional[str] = None, energy_level: Optiona
         genres=genres
     )
 
+    search = asyncio.ensure_future(_search(query, limit, headless))
+    if cancellation_token is not None:
+        cancellation_token.link_future(search)
+    return await search
+
+
+async def _search(query: MusicSearchQuery, limit: int, headless: bool = True) -> List[Song]:
+    # The one "searching" event of every pipeline (team tool call, fast and local paths)
+    await report_progress("searching", "Searching for music...", query=query.model_dump())
+    with span("music_lookup"):
+        songs = await _lookup(query, limit)
+    if songs is None:
+        # Canonical query: identical searches share cache entries and in-flight scrapes
+        query = query.normalized(MUSIC_CACHE_GRANULARITY)
+        key = f"{query.model_dump_json()}:{limit}"
+        fanout = _search_progress.get(key)
+        if fanout is None or not _search_flights.in_flight(key):
+            # The flight below starts with this fanout: nothing awaits in between
+            fanout = _search_progress[key] = ProgressFanout()
+        try:
+            with span("scrape"):
+                async with fanout.subscribe():
+                    songs = await _search_flights.do(key, lambda: _scrape_and_cache(query, limit, headless, fanout))
+        finally:
+            if not _search_flights.in_flight(key) and _search_progress.get(key) is fanout:
+                del _search_progress[key]
+    await report_progress("songs_found", f"{len(songs)} songs found", count=len(songs))
+    return songs
+
+
+async def stream_music_by_mood(mood: Optional[str] = None, energy_level: Optional[int] = None, happiness_level: Optional[int] = None, genres: Optional[list] = None, headless: bool = True, limit: int = 20) -> AsyncIterator[Song]:
+    """Async-generator variant of `search_music_by_mood` that yields songs as they are parsed.
+
+    Takes the same arguments. Live scrapes started here are not shared with
+    concurrent identical searches.
+    """
+    query = MusicSearchQuery(
+        mood=mood,
+        energy_level=energy_level,
+        happiness_level=happiness_level,
+        genres=genres
+    )
+    songs = await _lookup(query, limit)
+    if songs is not None:
+        for song in songs:
+            yield song
+        return
+
+    query = query.normalized(MUSIC_CACHE_GRANULARITY)
+    results: List[Song] = []
+    async for song in _iter_scrape(query, limit=limit, headless=headless):
+        results.append(song)
+        yield song
+    await _store(query, limit, results)
+
+
+async def _lookup(query: MusicSearchQuery, limit: int) -> Optional[List[Song]]:
+    """Answer from the precrawled catalog or the result cache, without a browser."""
+    catalog = get_music_catalog()
+    if catalog is not None:
+        songs = catalog.search(query, limit=limit)
+        if songs is not None:
+            return [Song(**song) for song in songs]
+
+    cache = get_music_cache()
+    if cache is not None:
+        cached = await cache.get(query.normalized(MUSIC_CACHE_GRANULARITY), limit)
+        if cached is not None:
+            return [Song(**song) for song in cached]
+    return None
+
+
+async def _store(query: MusicSearchQuery, limit: int, results: List[Song]) -> None:
+    cache = get_music_cache()
+    if cache is not None and results:
+        await cache.put(query, limit, [asdict(song) for song in results])
+
+
+async def _scrape_and_cache(query: MusicSearchQuery, limit: int, headless: bool = True,
+                            progress: Optional[ProgressFanout] = None) -> List[Song]:
+    results: List[Song] = []
+    async for song in _iter_scrape(query, limit=limit, headless=headless):
+        results.append(song)
+        # Partial results for the UI, long before the final chat reply; a shared scrape
+        # reports to every waiting caller, not only the one that started it
+        report = progress.report if progress is not None else report_progress
+        await report("song", f"Found {song.title}", song=asdict(song))
+    await _store(query, limit, results)
+    return results
+
+
+async def _iter_scrape(query: MusicSearchQuery, limit: int, headless: bool = True) -> AsyncIterator[Song]:
+    """Run the query on the live site."""
+    if _scraper_workers is not None:
+        async for song in _scraper_workers.iter_search(query, limit=limit):
+            yield song
+        return
+    async for song in iter_scrape_in_process(query, limit=limit, headless=headless):
+        yield song
+
+
+async def iter_scrape_in_process(query: MusicSearchQuery, limit: int, headless: bool = True) -> AsyncIterator[Song]:
+    """Run the query on the live site with a browser of this process (what a scraper
+    worker runs), bypassing the catalog, the cache and the worker pool."""
+    # Prefer a warm page from the shared pool when the app has started one
+    if _scraper_pool is not None:
+        async with _scraper_pool.lease() as scraper:
+            async for song in scraper.iter_search(query, limit=limit):
+                yield song
+        return
+
     async with MusicByMoodScraper(headless=headless) as scraper:
         await scraper.goto()
-        await scraper.apply_query(query)
-        results = await scraper.extract_results(limit=limit)
-        return results
+        async for song in scraper.iter_search(query, limit=limit):
+            yield song
 
 
 if __name__ == "__main__":
@@ -1,12 +1,23 @@
 import yaml
+import logging
 import aiofiles
-import json
 from pathlib import Path
-from typing import Any
-from autogen_ext.models.openai import OpenAIChatCompletionClient
+from typing import Any, Optional
+from autogen_core import CancellationToken
+from autogen_core.models import ChatCompletionClient
 from autogen_agentchat.agents import AssistantAgent
-from src.teams import get_music_team
+from autogen_agentchat.base import TaskResult
+from autogen_agentchat.messages import TextMessage
+from src.teams import MUSIC_PIPELINE_MODE, detect_music_query, get_music_team_pool
+from src.tools import encode_songs, search_music_by_mood
+from src.mood_parser import MOOD_PARSER_THRESHOLD, parse_mood
 from src.models import MusicSearchQuery
+from src.storage import ChatStateStore
+from src.context import ChatContext
+from src.progress import report_progress
+from src.timing import TimedChatCompletionClient, get_timer, span
+
+logger = logging.getLogger(__name__)
 
 # Format music team response
 async def format_music_team_response(team_result) -> str:
@@ -29,22 +40,56 @@ async def format_music_team_response(team_result) -> str:
     except Exception as e:
         return f"I found some music for you, but had trouble formatting the response. Error: {str(e)}"
 
+# Report music team progress
+async def report_team_progress(message: Any) -> None:
+    """
+    Publish a progress event for a notable music team message
+    Args:
+    - message: Message or event streamed by the music team
+    """
+    source = getattr(message, "source", None)
+    if isinstance(message, TextMessage) and source == "mood_detector":
+        try:
+            query = MusicSearchQuery.model_validate_json(message.content).model_dump()
+        except Exception:
+            query = None
+        await report_progress("mood_detected", f"Mood detected: {message.content}", query=query)
+    elif isinstance(message, TextMessage) and source == "approver":
+        await report_progress("approved", "Songs approved")
+
 # Search music for user
-async def search_music_for_user(description: str) -> str:
+async def search_music_for_user(description: str, cancellation_token: Optional[CancellationToken] = None) -> str:
     """
     Tool for the main chat agent to search music based on user's description.
     This function will be called by the chat agent when users ask for music.
     
     Args:
     - description: The user's description (e.g., "I want happy music", "Play some jazz")
+    - cancellation_token: Token of the chat turn (injected by the agent), passed down to
+      the music team and its scraper
     
     Returns:
     - raw_music_data: Raw music search results for the chat agent to format naturally
     """
     try:
-        # Get music team and process the request
-        music_team = await get_music_team()
-        team_result = await music_team.run(task=description)
+        # Search directly when the query is known without the team
+        query = await get_music_query(description, cancellation_token)
+        if query is not None:
+            songs = await search_music_by_mood(**query.model_dump(), cancellation_token=cancellation_token)
+            # No approver on this path: the songs are final once found
+            await report_progress("approved", "Songs ready", count=len(songs))
+            return f"MUSIC_SEARCH_RESULTS: {encode_songs(songs)}"
+
+        # Lease a music team and process the request, publishing progress along the way
+        team_result = None
+        async with get_music_team_pool().lease() as music_team:
+            with span("team_run"):
+                async for message in music_team.run_stream(task=description,
+                                                           cancellation_token=cancellation_token):
+                    if isinstance(message, TaskResult):
+                        team_result = message
+                    else:
+                        await report_team_progress(message)
         
         # Get the raw music team response (don't format it here - let chat agent handle formatting)
         response = await format_music_team_response(team_result)
@@ -55,23 +100,102 @@ async def search_music_for_user(description: str) -> str:
     except Exception as e:
         return f"MUSIC_SEARCH_ERROR: I had trouble finding music for you. Error: {str(e)}"
 
+# Get music query without the team
+async def get_music_query(description: str,
+                          cancellation_token: Optional[CancellationToken] = None) -> Optional[MusicSearchQuery]:
+    """
+    Search query for a description: from the local parser when it is confident,
+    else (in the fast pipeline mode) from one structured-output model call
+    Args:
+    - description: The user's description
+    - cancellation_token: Token of the chat turn
+    Returns:
+    - query: MusicSearchQuery, or None if the music team should handle the request
+    """
+    with span("mood_parse"):
+        parse = parse_mood(description)
+    if parse.confidence >= MOOD_PARSER_THRESHOLD:
+        query = parse.query
+    elif MUSIC_PIPELINE_MODE == "fast":
+        try:
+            with span("mood_detect"):
+                query = await detect_music_query(description, cancellation_token=cancellation_token)
+        except Exception as e:
+            logger.warning(f"Fast music pipeline could not build a query, using the team: {e}")
+            return None
+    else:
+        return None
+    await report_progress("mood_detected", f"Mood detected: {query.model_dump_json(exclude_none=True)}",
+                          query=query.model_dump())
+    return query
+
+# Parsed model configs keyed by path, with the file mtime they were read at
+_model_configs: dict[Path, tuple[float, dict[str, Any]]] = {}
+
+# Load model config
+async def load_model_config(model_config_path: Path) -> dict[str, Any]:
+    """
+    Load model config, re-reading the yaml file only when its mtime changes
+    Args:
+    - model_config_path: Path to model config yaml file
+    Returns:
+    - model_config: Component config of the model client
+    """
+    mtime = model_config_path.stat().st_mtime
+    cached = _model_configs.get(model_config_path)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with span("config_load"):
+        async with aiofiles.open(model_config_path, 'r') as f:
+            content = await f.read()
+            model_config = yaml.safe_load(content)
+    _model_configs[model_config_path] = (mtime, model_config)
+    return model_config
+
+# Get model client
+async def get_model_client(model_config_path: Path) -> ChatCompletionClient:
+    """
+    Create a model client from the (cached) model config
+    Args:
+    - model_config_path: Path to model config yaml file
+    Returns:
+    - model_client: ChatCompletionClient
+    """
+    model_config = await load_model_config(model_config_path)
+    # Load through the base type so any configured provider (OpenAI, Azure, ...) works
+    model_client = ChatCompletionClient.load_component(model_config)
+    if get_timer().active:
+        model_client = TimedChatCompletionClient(model_client, stage="llm")
+    return model_client
+
 # Get chat agent
 async def get_chat_agent(model_config_path: Path,
-                         state_path: Path)-> AssistantAgent:
+                         state_store: ChatStateStore,
+                         session_id: str,
+                         model_client: Optional[ChatCompletionClient] = None,
+                         max_messages: Optional[int] = None,
+                         stream: bool = False,
+                         context_policy: str = "all",
+                         context_max_messages: int = 40,
+                         context_token_budget: int = 4000)-> AssistantAgent:
     """
     Get chat agent
     Args:
     - model_config_path: Path to model config yaml file
-    - state_path: Path to state json file
+    - state_store: Store holding the agent state of each session
+    - session_id: Session whose state is loaded
+    - model_client: Existing model client to reuse (created from the config if None)
+    - max_messages: Only load this many of the newest context messages (None loads all)
+    - stream: Emit partial model tokens from `on_messages_stream`
+    - context_policy: Part of the conversation sent to the model: "all", "window", "tokens" or "summary"
+    - context_max_messages: Window size of the "window" and "summary" policies
+    - context_token_budget: Prompt token budget of the "tokens" policy
     Returns:
     - chat_agent: AssistantAgent
     """
-    # Load model config
-    async with aiofiles.open(model_config_path, 'r') as f:
-        content = await f.read()
-        model_config = yaml.safe_load(content)
-
-    model_client = OpenAIChatCompletionClient.load_component(model_config)
+    if model_client is None:
+        model_client = await get_model_client(model_config_path)
    
     # Create chat agent
     chat_agent = AssistantAgent(
@@ -110,39 +234,18 @@ async def get_chat_agent(model_config_path: Path,
         Goal:
         Prioritize emotional connection; music is just one supportive tool.
         """,
-        tools=[search_music_for_user]
+        tools=[search_music_for_user],
+        model_client_stream=stream,
+        model_context=ChatContext(model_client,
+                                  policy=context_policy,
+                                  max_messages=context_max_messages,
+                                  token_budget=context_token_budget)
     )
 
     # Load state if exists
-    if not state_path.exists():
+    with span("state_load"):
+        state = await state_store.load_state(session_id, max_messages=max_messages)
+    if state is None:
         return chat_agent
-    
-    async with aiofiles.open(state_path, "r") as file:
-        text = await file.read()
-    state: dict[str, Any] = {}
-    if text.strip():
-        try:
-            state = json.loads(text)
-        except Exception:
-            state = {}
     await chat_agent.load_state(state)
     return chat_agent
-    
-# Get chat history
-async def get_history(history_path: Path) -> list[dict[str, Any]]:
-    """Get chat history from file.
-    Args:
-    - history_path: Path to history json file
-    Returns:
-    - history: list of chat messages
-    """
-    if not history_path.exists():
-        return []
-    async with aiofiles.open(history_path, "r") as file:
-        text = await file.read()
-    if not text.strip():
-        return []
-    try:
-        return json.loads(text)
-    except Exception:
-        return []
\ No newline at end of file
@@ -0,0 +1,212 @@
+import signal
+import asyncio
+import logging
+import multiprocessing
+from dataclasses import asdict
+from contextlib import suppress
+from multiprocessing.connection import Connection
+from typing import Any, AsyncIterator
+from src.models import MusicSearchQuery
+from src.tools import ScraperPool, Song, set_scraper_pool, iter_scrape_in_process
+from src.timing import span
+
+logger = logging.getLogger(__name__)
+
+# Workers are spawned, not forked: Playwright and the server's event loop do not survive a fork
+_mp = multiprocessing.get_context("spawn")
+
+
+class _Worker:
+    __slots__ = ("process", "conn")
+
+    def __init__(self, process: Any, conn: Connection) -> None:
+        self.process = process
+        self.conn = conn
+
+
+class ScraperWorkerPool:
+    """Scraper processes that run music searches away from the server's event loop.
+
+    Each worker is a separate process with its own Chromium (a one-page
+    ``ScraperPool``) and a private pipe to the server. A search leases an idle
+    worker, sends it the query and receives the songs one message at a time, so
+    progress still streams. A job that fails to finish within ``job_timeout``
+    seconds, is cancelled, or loses its worker (crash, wedged browser) gets the
+    worker killed and a fresh one started in its place; the other workers and the
+    server keep running.
+    """
+
+    def __init__(self, size: int = 2, job_timeout: float = 60.0, headless: bool = True,
+                 max_uses: int = 25, timeout_ms: int = 30000) -> None:
+        """
+        Args:
+        - size: Number of worker processes, i.e. concurrent scrapes
+        - job_timeout: Seconds a search may take before its worker is restarted
+        - headless: Run the workers' browsers headless
+        - max_uses: Searches per browser context before a worker recycles it
+        - timeout_ms: Playwright timeout of page operations inside a worker
+        """
+        if size < 1:
+            raise ValueError(f"Worker pool size must be at least 1, got {size}")
+        self.size = size
+        self.job_timeout = job_timeout
+        self.headless = headless
+        self.max_uses = max_uses
+        self.timeout_ms = timeout_ms
+        self._idle: "asyncio.Queue[_Worker]" = asyncio.Queue()
+        self._workers: set = set()
+        self._pending: set = set()
+        self.jobs = 0
+        self.failed = 0
+        self.timeouts = 0
+        self.restarts = 0
+
+    async def start(self) -> "ScraperWorkerPool":
+        for _ in range(self.size):
+            self._idle.put_nowait(self._spawn())
+        return self
+
+    async def stop(self) -> None:
+        """Shut every worker down, giving each up to 5 s to finish its current job."""
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        workers, self._workers = self._workers, set()
+        for worker in workers:
+            with suppress(OSError):
+                worker.conn.send(None)
+        await asyncio.gather(*(self._terminate(w, grace=5.0) for w in workers), return_exceptions=True)
+        while not self._idle.empty():
+            self._idle.get_nowait()
+
+    def _spawn(self) -> _Worker:
+        conn, child_conn = _mp.Pipe()
+        process = _mp.Process(target=_worker_main,
+                              args=(child_conn, self.headless, self.max_uses, self.timeout_ms),
+                              name="chattune-scraper", daemon=True)
+        process.start()
+        child_conn.close()
+        worker = _Worker(process, conn)
+        self._workers.add(worker)
+        return worker
+
+    async def _terminate(self, worker: _Worker, grace: float = 0.0) -> None:
+        self._workers.discard(worker)
+        if grace:
+            await asyncio.to_thread(worker.process.join, grace)
+        if worker.process.is_alive():
+            worker.process.kill()
+            await asyncio.to_thread(worker.process.join)
+        worker.conn.close()
+
+    async def _restart(self, worker: _Worker) -> None:
+        try:
+            await self._terminate(worker)
+        finally:
+            self.restarts += 1
+            self._idle.put_nowait(self._spawn())
+
+    async def _recv(self, conn: Connection) -> Any:
+        """Next message from a worker, without blocking the event loop."""
+        loop = asyncio.get_running_loop()
+        while not conn.poll():
+            readable = loop.create_future()
+            loop.add_reader(conn.fileno(), lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(conn.fileno())
+        return conn.recv()
+
+    async def iter_search(self, query: MusicSearchQuery, limit: int = 20) -> AsyncIterator[Song]:
+        """Run the query in a worker process and yield its songs as they arrive."""
+        worker = await self._idle.get()
+        if not worker.process.is_alive():
+            # Died while idle: replace it before handing it the job
+            await self._terminate(worker)
+            self.restarts += 1
+            worker = self._spawn()
+        self.jobs += 1
+        healthy = False
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.job_timeout
+        try:
+            with span("worker_job"):
+                worker.conn.send((query.model_dump_json(), limit))
+                while True:
+                    try:
+                        kind, payload = await asyncio.wait_for(self._recv(worker.conn), deadline - loop.time())
+                    except asyncio.TimeoutError:
+                        self.timeouts += 1
+                        raise TimeoutError(f"Music search timed out after {self.job_timeout:g} s") from None
+                    except (EOFError, OSError) as e:
+                        raise RuntimeError(f"Scraper worker exited (code {worker.process.exitcode})") from e
+                    if kind == "song":
+                        yield Song(**payload)
+                    elif kind == "done":
+                        healthy = True
+                        return
+                    else:
+                        # The worker reported the failure and is ready for the next job
+                        healthy = True
+                        raise RuntimeError(payload)
+        except BaseException:
+            self.failed += 1
+            raise
+        finally:
+            if healthy:
+                self._idle.put_nowait(worker)
+            else:
+                # Still busy with (or dead from) this job: replace it off the caller's path
+                logger.warning(f"Restarting scraper worker {worker.process.pid}")
+                task = asyncio.create_task(self._restart(worker))
+                self._pending.add(task)
+                task.add_done_callback(self._pending.discard)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "size": self.size,
+            "idle": self._idle.qsize(),
+            "jobs": self.jobs,
+            "failed": self.failed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+        }
+
+
+def _worker_main(conn: Connection, headless: bool, max_uses: int, timeout_ms: int) -> None:
+    # The server stops its workers itself; a terminal Ctrl+C must not kill them mid-job
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    asyncio.run(_serve(conn, headless, max_uses, timeout_ms))
+
+
+async def _serve(conn: Connection, headless: bool, max_uses: int, timeout_ms: int) -> None:
+    """Worker loop: one warm page, one job at a time, songs streamed back as dicts."""
+    loop = asyncio.get_running_loop()
+    pool = None
+    try:
+        pool = await ScraperPool(size=1, max_uses=max_uses, headless=headless, timeout_ms=timeout_ms).start()
+        set_scraper_pool(pool)
+    except Exception as e:
+        # Fall back to a browser per job, like the server without a pool
+        logger.error(f"Scraper worker could not start its page pool: {e}")
+        pool = None
+    try:
+        while True:
+            try:
+                job = await loop.run_in_executor(None, conn.recv)
+            except (EOFError, OSError):
+                return
+            if job is None:
+                return
+            query_json, limit = job
+            try:
+                query = MusicSearchQuery.model_validate_json(query_json)
+                async for song in iter_scrape_in_process(query, limit=limit, headless=headless):
+                    conn.send(("song", asdict(song)))
+                conn.send(("done", None))
+            except Exception as e:
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        set_scraper_pool(None)
+        if pool is not None:
+            await pool.stop()
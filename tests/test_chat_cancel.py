@@ -0,0 +1,103 @@
+"""Cancelling a chat turn while its music search tool call is still running.
+
+Serves chat_app with uvicorn, the scripted model client of the benchmarks and a
+scraper that never finishes, so each music turn is stuck in its tool call until
+it is cancelled by a "cancel" frame or a superseding message.
+"""
+import os
+import sys
+import json
+import socket
+import asyncio
+import tempfile
+import importlib
+from pathlib import Path
+
+import pytest
+
+# Upper bound on every wait for a frame; a stuck turn fails the test instead of hanging it
+TIMEOUT = 10
+
+
+@pytest.fixture(scope="module")
+def chat_app():
+    workdir = Path(tempfile.mkdtemp(prefix="chattune-test-"))
+    model_config = workdir / "model_config.yaml"
+    model_config.write_text("provider: benchmarks.fake_llm.ScriptedChatCompletionClient\n"
+                            "config:\n  latency_ms: 10\n  chunk_delay_ms: 0\n")
+    os.environ.update({
+        "MODEL_CONFIG_PATH": str(model_config),
+        "MUSIC_TEAM_MODEL_CONFIG": str(model_config),
+        "CHAT_STATE_DB": str(workdir / "chat_state.sqlite3"),
+        "MUSIC_PIPELINE_MODE": "fast",
+        "MUSIC_CACHE_TTL": "0",
+        "MUSIC_CATALOG_PATH": "",
+        "MUSIC_LLM_CACHE_AGENTS": "",
+        "SCRAPER_POOL_SIZE": "0",
+        "SCRAPER_WORKERS": "0",
+        "AGENTOPS_API_KEY": "",
+    })
+    # Imported here so the modules read the settings above
+    for name in [m for m in sys.modules if m == "chat_app" or m.startswith("src.")]:
+        del sys.modules[name]
+    app = importlib.import_module("chat_app")
+    tools = importlib.import_module("src.tools")
+
+    # A live search that only ends when it is cancelled
+    async def stuck_scrape(query, limit, headless=True):
+        await asyncio.Event().wait()
+        yield
+
+    tools._iter_scrape = stuck_scrape
+    return app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _recv_until(ws, stage=None, frame_type=None) -> dict:
+    while True:
+        frame = json.loads(await asyncio.wait_for(ws.recv(), TIMEOUT))
+        if (stage is not None and frame.get("stage") == stage) or frame.get("type") == frame_type:
+            return frame
+
+
+async def _cancel_during_search(app, policy: str) -> dict:
+    import uvicorn
+    import websockets
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app.app, host="127.0.0.1", port=port, log_level="warning"))
+    serving = asyncio.create_task(server.serve())
+    try:
+        while not server.started:
+            await asyncio.sleep(0.05)
+        async with websockets.connect(f"ws://127.0.0.1:{port}/ws/chat?session=cancel-{policy}") as ws:
+            await ws.send(json.dumps({"content": "play some happy pop music", "source": "user"}))
+            # The search has started: the turn is inside the tool call
+            await _recv_until(ws, stage="searching")
+
+            followup = json.dumps({"content": "thanks, how are you?", "source": "user"})
+            if policy == "queue":
+                await ws.send(json.dumps({"type": "cancel"}))
+                await _recv_until(ws, frame_type="cancelled")
+                await ws.send(followup)
+            else:
+                # The new message replaces the turn in progress
+                await ws.send(followup)
+                await _recv_until(ws, frame_type="cancelled")
+            return await _recv_until(ws, frame_type="final")
+    finally:
+        server.should_exit = True
+        await serving
+
+
+@pytest.mark.parametrize("policy", ["queue", "supersede"])
+def test_cancel_during_tool_call(chat_app, monkeypatch, policy):
+    monkeypatch.setattr(chat_app, "CHAT_BUSY_POLICY", policy)
+    final = asyncio.run(_cancel_during_search(chat_app, policy))
+    # The next turn ran on the restored context, without the half-finished tool call
+    assert final["content"].startswith("I hear you")